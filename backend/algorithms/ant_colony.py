@@ -1,90 +1,51 @@
-from pydantic import BaseModel
-from typing import List, Tuple
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Tuple, Optional
+from threading import Lock
+import struct
 import numpy as np
 from math import pi
 
 
-def normalize(arr: np.ndarray):
-    norm = np.linalg.norm(arr)
-
-    if norm == 0:
-        return arr
-    return arr / norm
+# бинарный кадр (little-endian): заголовок FRAME_HEADER, затем
+# позиции float32[N, 2], флаги uint8[N] (бит 0 - несёт еду) и феромоны:
+# "grid"   - uint8[2, W, W], значение клетки = q / 255 * scale (с насыщением);
+# "sparse" - выравнивание до 4 байт, count uint32, индексы uint32[count]
+#            в развёрнутой сетке [type, x, y], значения uint8[count]
+FRAME_MAGIC = b"ANTF"
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("<4sBBHIIHHff")
+FRAME_PHEROMONE_MODES = {"grid": 0, "sparse": 1}
 
+# ограничения одного запроса: число кадров в ответе и шагов муравьёв (steps * colony_size)
+MAX_SAMPLED_FRAMES = 1000
+MAX_ANT_UPDATES = 20_000_000
 
-def random_unit_circle():
-    arr = np.random.rand(2)
-    arr[0] -= 0.5
-    arr[1] -= 0.5
-
-    return normalize(arr)
 
+def check_ant_budget(colony_size: int, steps: int, sample_every: int = 0):
+    """
+    Raises:
+        ValueError: если запрос вернёт больше MAX_SAMPLED_FRAMES кадров
+            или потребует больше MAX_ANT_UPDATES шагов муравьёв
+    """
+    if sample_every > 0 and steps // sample_every > MAX_SAMPLED_FRAMES:
+        raise ValueError(f"Не более {MAX_SAMPLED_FRAMES} кадров за запрос, увеличьте sample_every")
+    if steps * max(1, colony_size) > MAX_ANT_UPDATES:
+        raise ValueError(f"steps * colony_size не должно превышать {MAX_ANT_UPDATES}")
 
-def circle_intersect(center1: Tuple[float, float], rad1: float, center2: Tuple[float, float], rad2: float) -> bool:
-    return ((center1[0] - center2[0]) ** 2 + (center1[1] - center2[1]) ** 2) ** .5 <= rad1 + rad2
-
-
-class Ant:
-    max_speed: float = 10
-    wander_strength: float = 0.2
-    size: float = 2.5
-
-    position: np.ndarray
-    velocity: np.ndarray
-    direction: np.ndarray
-
-    is_holding_food: bool
-    current_pheromone_delay: int
-    current_pheromone_strength: float
 
-    def __init__(self, home: Tuple[float, float] = [0, 0]):
-        self.position = np.array([home[0], home[1]])
-        self.velocity = np.array([0, 0])
-        self.direction = random_unit_circle()
-        self.is_holding_food = False
-        self.current_pheromone_delay = 0
-        self.current_pheromone_strength = 1
-    
-    def rotate_vector(self, angle: float, vec: np.ndarray):
-        rot_matrix = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
-        return np.dot(rot_matrix, vec)
-    
-    def get_pheromones_in_circle(self, angle: float, distance_forward: float, circle_radius: float, pheromones: List[Tuple[float, float, float, int]]):
-        current_direction = self.rotate_vector(angle, self.direction)
-        current_direction = current_direction * distance_forward
-        currrent_position = self.position + current_direction
-
-        pheromones_strength = 0
-        for pheromone in pheromones:
-            if circle_intersect(currrent_position, circle_radius, pheromone[:2], 0) and self.is_holding_food == (pheromone[3] == 0):
-                pheromones_strength += pheromone[2]
-        return pheromones_strength
-
-
-    
-    def get_direction(self, pheromones: List[Tuple[float, float, float, int]]):
-        angle = pi / 3
-        distance_forward = self.size * 5
-        circle_radius = self.size * 5
-
-        left_pheromones = self.get_pheromones_in_circle(-angle, distance_forward, circle_radius, pheromones)
-        center_pheromones = self.get_pheromones_in_circle(0, distance_forward, circle_radius, pheromones)
-        right_pheromones = self.get_pheromones_in_circle(angle, distance_forward, circle_radius, pheromones)
-
-        if center_pheromones >= left_pheromones and center_pheromones >= right_pheromones:
-            return self.direction
-        elif right_pheromones > left_pheromones:
-            return self.rotate_vector(angle, self.direction)
-        else:
-            return self.rotate_vector(-angle, self.direction)
+def normalize(arr: np.ndarray):
+    # нормирует векторы по последней оси, нулевые векторы остаются нулевыми
+    norm = np.linalg.norm(arr, axis=-1, keepdims=True)
+    return np.divide(arr, norm, out=arr.astype(float), where=norm != 0)
 
 
+def random_unit_circle(count: int = 1, rng: Optional[np.random.Generator] = None):
+    arr = (rng if rng is not None else np.random.default_rng()).random((count, 2)) - 0.5
+    return normalize(arr)
 
-    def update(self, delta_time: float, pheromones: List[Tuple[float, float, float, int]]):
-        self.direction = normalize(normalize(self.get_direction(pheromones)) + random_unit_circle() * self.wander_strength)
 
-        self.velocity = self.direction * self.max_speed
-        self.position += self.velocity * delta_time
+def rotation_matrix(angle: float) -> np.ndarray:
+    return np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
 
 
 class AntDto(BaseModel):
@@ -96,19 +57,6 @@ class AntDto(BaseModel):
     current_pheromone_delay: int
     current_pheromone_strength: float
 
-    def to_ant(self):
-        ant = Ant()
-
-        ant.position = np.array(self.position)
-        ant.velocity = np.array(self.velocity)
-        ant.direction = np.array(self.direction)
-
-        ant.is_holding_food = self.is_holding_food
-        ant.current_pheromone_delay = self.current_pheromone_delay
-        ant.current_pheromone_strength = self.current_pheromone_strength
-        
-        return ant
-
 
 class AntColony:
     field_size = 500
@@ -121,74 +69,206 @@ class AntColony:
     food_sources: List[Tuple[float, float, float]]
     food_size: float = 25
 
-    ants: List[Ant]
+    # муравьи хранятся по столбцам: i-я строка каждого массива - i-й муравей
+    max_speed: float = 10
+    wander_strength: float = 0.2
+    ant_size: float = 2.5
+    sensor_angle: float = pi / 3
+
+    positions: np.ndarray           # (N, 2)
+    velocities: np.ndarray          # (N, 2)
+    directions: np.ndarray          # (N, 2)
+    is_holding_food: np.ndarray     # (N,) bool
+    pheromone_delays: np.ndarray    # (N,) int
+    pheromone_strengths: np.ndarray # (N,) float
 
-    # [x, y, durability, type]
+    # интенсивность феромонов в клетках поля: pheromone_grid[type, x, y]
     # 0 - from home to food
     # 1 - from food to home
-    pheromones: List[Tuple[float, float, float, int]]
+    pheromone_grid: np.ndarray      # (2, W, W)
+    pheromone_cell_size: float = 2.5
     pheromone_delay: int = 1
     pheromone_step: float = 0.95
     phermone_epsilon: float = 0.01
+    # в бинарном кадре интенсивности выше этой насыщаются до 255
+    frame_pheromone_scale: float = 1.0
 
-    def __init__(self, home: Tuple[float, float] = [0, 0], colony_size: int = 0):
+    def __init__(self, home: Tuple[float, float] = [0, 0], colony_size: int = 0, seed: Optional[int] = None):
         super().__init__()
-        self.ants = [Ant(home) for _ in range(colony_size)]
+        # у каждой колонии свой ГСЧ: при одинаковом seed симуляция воспроизводится
+        self.rng = np.random.default_rng(seed)
         self.home = home
         self.food_sources = []
-        self.pheromones = []
+
+        cells = int(np.ceil(self.field_size / self.pheromone_cell_size))
+        self.pheromone_grid = np.zeros((2, cells, cells))
+
+        self.positions = np.tile(np.array(home, dtype=float), (colony_size, 1))
+        self.velocities = np.zeros((colony_size, 2))
+        self.directions = random_unit_circle(colony_size, self.rng)
+        self.is_holding_food = np.zeros(colony_size, dtype=bool)
+        self.pheromone_delays = np.zeros(colony_size, dtype=int)
+        self.pheromone_strengths = np.ones(colony_size)
+        self.ticks = 0
+        self.food_delivered = 0
+
+    @property
+    def colony_size(self) -> int:
+        return len(self.positions)
+
+    def cells_of(self, points: np.ndarray) -> np.ndarray:
+        # индексы клеток сетки феромонов, точки за пределами поля попадают в крайние клетки
+        cells = np.floor(points / self.pheromone_cell_size).astype(int)
+        return np.clip(cells, 0, self.pheromone_grid.shape[1] - 1)
+
+    def deposit(self, points: np.ndarray, strengths: np.ndarray, kinds: np.ndarray):
+        cells = self.cells_of(points)
+        grid_shape = self.pheromone_grid.shape
+        flat = np.ravel_multi_index((kinds.astype(int), cells[:, 0], cells[:, 1]), grid_shape)
+        self.pheromone_grid += np.bincount(flat, weights=strengths, minlength=self.pheromone_grid.size) \
+            .reshape(grid_shape)
+
+    @property
+    def pheromones(self) -> np.ndarray:
+        # непустые клетки в старом формате [x, y, durability, type], координаты - центры клеток
+        kinds, xs, ys = np.nonzero(self.pheromone_grid)
+        return np.column_stack(((xs + 0.5) * self.pheromone_cell_size, (ys + 0.5) * self.pheromone_cell_size,
+                                self.pheromone_grid[kinds, xs, ys], kinds))
+
+    def sense_pheromones(self, sensors: np.ndarray, radius: float) -> np.ndarray:
+        """
+        Сумма феромонов в квадратном окне со стороной 2 * radius вокруг каждого
+        датчика, по таблице префиксных сумм. sensors: (N, S, 2) - S датчиков
+        каждого муравья. Муравей с едой чувствует только феромоны типа 0,
+        без еды - только типа 1.
+        """
+        table = np.zeros((2, self.pheromone_grid.shape[1] + 1, self.pheromone_grid.shape[2] + 1))
+        table[:, 1:, 1:] = self.pheromone_grid.cumsum(axis=1).cumsum(axis=2)
+
+        low = self.cells_of(sensors - radius)
+        high = self.cells_of(sensors + radius) + 1
+        kind = np.where(self.is_holding_food, 0, 1)[:, None]
+
+        return (table[kind, high[..., 0], high[..., 1]] - table[kind, low[..., 0], high[..., 1]]
+                - table[kind, high[..., 0], low[..., 1]] + table[kind, low[..., 0], low[..., 1]])
+
+    def steer(self):
+        # три датчика: слева, по центру и справа от направления движения
+        distance_forward = self.ant_size * 5
+        circle_radius = self.ant_size * 5
+
+        rotations = np.stack([rotation_matrix(-self.sensor_angle), np.eye(2), rotation_matrix(self.sensor_angle)])
+        turned = np.einsum('sij,nj->nsi', rotations, self.directions)
+        left, center, right = self.sense_pheromones(self.positions[:, None, :] + turned * distance_forward,
+                                                    circle_radius).T
+
+        keep = (center >= left) & (center >= right)
+        choice = np.where(keep, 1, np.where(right > left, 2, 0))
+        return turned[np.arange(self.colony_size), choice]
 
     def update(self, delta_time):
+        size = self.colony_size
+
         # update ants
-        for ant in self.ants:
-            ant.update(delta_time, self.pheromones)
-
-            if ant.position[0] < 0 or ant.position[1] < 0 or ant.position[0] > self.field_size or ant.position[1] > self.field_size:
-                ant.direction = -ant.direction
-
-            # update is_holding_food field
-            if ant.is_holding_food:
-                if circle_intersect(ant.position, ant.size, self.home, self.home_size):
-                    ant.is_holding_food = False
-                    ant.direction = -ant.direction
-                    ant.current_pheromone_strength = 1
-            else:
-                for food_source in self.food_sources:
-                    if circle_intersect(ant.position, ant.size, (food_source[0], food_source[1]), self.food_size):
-                        ant.is_holding_food = True
-                        ant.direction = -ant.direction
-                        ant.current_pheromone_strength = food_source[2] / 100
-                        break
-            
-            # add pheromones
-            if ant.current_pheromone_delay == 0:
-                self.pheromones.append((ant.position[0], ant.position[1], ant.current_pheromone_strength, 1 if ant.is_holding_food else 0))
-            ant.current_pheromone_delay = (ant.current_pheromone_delay + 1) % self.pheromone_delay
-
-            if ant.current_pheromone_strength > 0:
-                ant.current_pheromone_strength *= self.pheromone_step
+        wander = random_unit_circle(size, self.rng) * self.wander_strength
+        self.directions = normalize(normalize(self.steer()) + wander)
+        self.velocities = self.directions * self.max_speed
+        self.positions = self.positions + self.velocities * delta_time
+
+        outside = ((self.positions < 0) | (self.positions > self.field_size)).any(axis=1)
+        self.directions[outside] *= -1
+
+        # update is_holding_food field
+        home_distance = np.linalg.norm(self.positions - np.asarray(self.home, dtype=float), axis=1)
+        at_home = self.is_holding_food & (home_distance <= self.ant_size + self.home_size)
+
+        at_food = np.zeros(size, dtype=bool)
+        food_strength = np.zeros(size)
+        if self.food_sources:
+            food = np.asarray(self.food_sources, dtype=float).reshape(-1, 3)
+            touching = np.linalg.norm(self.positions[:, None, :] - food[None, :, :2], axis=2) \
+                <= self.ant_size + self.food_size
+            at_food = ~self.is_holding_food & touching.any(axis=1)
+            food_strength = food[touching.argmax(axis=1), 2] / 100
+
+        self.food_delivered += int(at_home.sum())
+        self.is_holding_food[at_home] = False
+        self.pheromone_strengths[at_home] = 1
+        self.is_holding_food[at_food] = True
+        self.pheromone_strengths[at_food] = food_strength[at_food]
+        self.directions[at_home | at_food] *= -1
+
+        # add pheromones
+        emitting = self.pheromone_delays == 0
+        self.deposit(self.positions[emitting], self.pheromone_strengths[emitting],
+                     self.is_holding_food[emitting])
+        self.pheromone_delays = (self.pheromone_delays + 1) % self.pheromone_delay
+
+        positive = self.pheromone_strengths > 0
+        self.pheromone_strengths[positive] *= self.pheromone_step
 
-        
         # update pheromones
-        self.pheromones = list(filter(lambda phe: phe[2] > self.phermone_epsilon, map(lambda phe: (phe[0], phe[1], phe[2] * self.pheromone_step, phe[3]), self.pheromones)))
-    
+        self.pheromone_grid *= self.pheromone_step
+        self.pheromone_grid[self.pheromone_grid <= self.phermone_epsilon] = 0
+        self.ticks += 1
+
+    def advance(self, steps: int, delta_time: float = 1, sample_every: int = 0) -> List[dict]:
+        """
+        Делает steps шагов подряд. Возвращает кадры каждые sample_every шагов
+        (0 - без промежуточных) и всегда кадр после последнего шага.
+        """
+        frames = []
+        for step in range(1, steps + 1):
+            self.update(delta_time)
+            if sample_every and step % sample_every == 0 and step != steps:
+                frames.append(self.frame())
+        frames.append(self.frame())
+        return frames
+
+    def frame(self):
+        # только то, что нужно для отрисовки
+        return {
+            "tick": self.ticks,
+            "positions": self.positions.tolist(),
+            "is_holding_food": self.is_holding_food.tolist(),
+            "pheromones": [(x, y, strength, int(kind)) for x, y, strength, kind in self.pheromones.tolist()]
+        }
+
+    def encode_frame(self, pheromones: str = "grid") -> bytes:
+        """Кадр в бинарном формате (см. FRAME_HEADER), pheromones - "grid" или "sparse"."""
+        scale = self.frame_pheromone_scale
+        quantized = np.rint(np.minimum(self.pheromone_grid / scale, 1) * 255).astype(np.uint8)
+
+        header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, FRAME_PHEROMONE_MODES[pheromones], 0,
+                                   self.ticks, self.colony_size, self.pheromone_grid.shape[1], 0,
+                                   self.pheromone_cell_size, scale)
+        parts = [header, self.positions.astype(np.float32), self.is_holding_food.view(np.uint8)]
 
-    def denumpy_array(self, arr: np.ndarray):
-        return [float(el) for el in arr]
+        if pheromones == "grid":
+            parts.append(quantized)
+        else:
+            cells = np.flatnonzero(quantized)
+            parts.append(bytes(-(len(header) + self.colony_size * 9) % 4))
+            parts.extend([struct.pack("<I", len(cells)), cells.astype(np.uint32), quantized.ravel()[cells]])
+
+        return b"".join(memoryview(np.ascontiguousarray(part)) if isinstance(part, np.ndarray) else part
+                        for part in parts)
 
     def to_json(self):
         return {
             "home": self.home,
             "food_sources": self.food_sources,
             "ants": [{
-                "position": self.denumpy_array(ant.position),
-                "velocity": self.denumpy_array(ant.velocity),
-                "direction": self.denumpy_array(ant.direction),
-                "is_holding_food": ant.is_holding_food,
-                "current_pheromone_delay": ant.current_pheromone_delay,
-                "current_pheromone_strength": ant.current_pheromone_strength
-            } for ant in self.ants],
-            "pheromones": self.pheromones
+                "position": position,
+                "velocity": velocity,
+                "direction": direction,
+                "is_holding_food": holding,
+                "current_pheromone_delay": delay,
+                "current_pheromone_strength": strength
+            } for position, velocity, direction, holding, delay, strength in zip(
+                self.positions.tolist(), self.velocities.tolist(), self.directions.tolist(),
+                self.is_holding_food.tolist(), self.pheromone_delays.tolist(), self.pheromone_strengths.tolist())],
+            "pheromones": [(x, y, strength, int(kind)) for x, y, strength, kind in self.pheromones.tolist()]
         }
 
 class AntColonyDto(BaseModel):
@@ -201,16 +281,70 @@ class AntColonyDto(BaseModel):
     ants: List[AntDto]
     pheromones: List[Tuple[float, float, float, int]]
 
+    seed: Optional[int] = None
+
     def to_colony(self):
-        colony = AntColony()
+        colony = AntColony(seed=self.seed)
         
         colony.home = self.home
         colony.food_sources = self.food_sources
-        colony.ants = [ant.to_ant() for ant in self.ants]
-        colony.pheromones = self.pheromones
+
+        colony.positions = np.array([ant.position for ant in self.ants], dtype=float).reshape(-1, 2)
+        colony.velocities = np.array([ant.velocity for ant in self.ants], dtype=float).reshape(-1, 2)
+        colony.directions = np.array([ant.direction for ant in self.ants], dtype=float).reshape(-1, 2)
+        colony.is_holding_food = np.array([ant.is_holding_food for ant in self.ants], dtype=bool)
+        colony.pheromone_delays = np.array([ant.current_pheromone_delay for ant in self.ants], dtype=int)
+        colony.pheromone_strengths = np.array([ant.current_pheromone_strength for ant in self.ants], dtype=float)
+
+        pheromones = np.array(self.pheromones, dtype=float).reshape(-1, 4)
+        colony.deposit(pheromones[:, :2], pheromones[:, 2], pheromones[:, 3])
 
         return colony
 
+class AntSessionDto(BaseModel):
+    home: Tuple[float, float]
+    colony_size: int = Field(ge=0, le=100000)
+    food_sources: List[Tuple[float, float, float]] = []
+    seed: Optional[int] = None
+
+
+class AntFastForwardDto(AntSessionDto):
+    steps: int = Field(1000, ge=1, le=100000)
+    delta_time: float = 1
+    sample_every: int = Field(0, ge=0)
+
+    @model_validator(mode="after")
+    def check_budget(self):
+        check_ant_budget(self.colony_size, self.steps, self.sample_every)
+        return self
+
+
+class AntSimulation:
+    """Колония, живущая на сервере между запросами. Шаги выполняются под блокировкой."""
+
+    def __init__(self, colony: AntColony):
+        self.colony = colony
+        self.lock = Lock()
+
+    def advance(self, steps: int = 1, delta_time: float = 1, sample_every: int = 0) -> List[dict]:
+        with self.lock:
+            return self.colony.advance(steps, delta_time, sample_every)
+
+    def set_food_sources(self, food_sources: List[Tuple[float, float, float]]):
+        with self.lock:
+            self.colony.food_sources = [tuple(source) for source in food_sources]
+
+    def frame(self):
+        with self.lock:
+            return self.colony.frame()
+
+    def advance_encoded(self, steps: int = 1, delta_time: float = 1, pheromones: str = "grid") -> bytes:
+        with self.lock:
+            for _ in range(steps):
+                self.colony.update(delta_time)
+            return self.colony.encode_frame(pheromones)
+
+
 """
 1. Put food sources + field for ants + ui + food collision. DONE
 2. Add pheromones.  DONE
@@ -0,0 +1,116 @@
+"""
+Перебор параметров муравьиной колонии.
+
+Каждая конфигурация прогоняется без визуализации заданное число шагов
+в пуле процессов, результаты повторов агрегируются в таблицу.
+"""
+
+from typing import List, Tuple, Dict, Optional
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import math
+import os
+import numpy as np
+from pydantic import BaseModel, Field
+
+from backend.algorithms.ant_colony import AntColony
+
+# допустимые значения каждого параметра: [min, max]
+SWEEP_PARAMETERS = {
+    "wander_strength": (0, 10),
+    "pheromone_step": (0, 1),
+    "pheromone_delay": (1, 1000),
+    "food_size": (0, 1000),
+    "home_size": (0, 1000),
+    "max_speed": (0, 1000)
+}
+MAX_SWEEP_RUNS = 256
+# шаги муравьёв всех прогонов (прогоны * ticks * colony_size), ~1 мкс на шаг
+MAX_SWEEP_ANT_UPDATES = 100_000_000
+MAX_SWEEP_PROCESSES = 4
+
+
+class AntSweepDto(BaseModel):
+    home: Tuple[float, float]
+    colony_size: int = Field(200, ge=1, le=20000)
+    food_sources: List[Tuple[float, float, float]]
+    # имя параметра -> список значений, перебирается декартово произведение
+    parameters: Dict[str, List[float]]
+    ticks: int = Field(500, ge=1, le=20000)
+    repeats: int = Field(1, ge=1, le=16)
+    delta_time: float = 1
+    seed: Optional[int] = None
+
+
+def _run_colony(home, colony_size, food_sources, parameters: dict, ticks: int, delta_time: float, seed: int):
+    colony = AntColony(home, colony_size, seed)
+    colony.food_sources = [tuple(source) for source in food_sources]
+    for name, value in parameters.items():
+        setattr(colony, name, int(value) if name == "pheromone_delay" else value)
+
+    pheromone_cells = np.empty(ticks)
+    for tick in range(ticks):
+        colony.update(delta_time)
+        pheromone_cells[tick] = np.count_nonzero(colony.pheromone_grid)
+
+    return {
+        "food_delivered": colony.food_delivered,
+        "food_per_tick": colony.food_delivered / ticks,
+        "pheromone_cells_mean": float(pheromone_cells.mean()),
+        "pheromone_cells_final": int(pheromone_cells[-1]),
+        "holding_food_final": int(colony.is_holding_food.sum())
+    }
+
+
+def run_sweep(home: Tuple[float, float], colony_size: int, food_sources: List[Tuple[float, float, float]],
+              parameters: Dict[str, List[float]], ticks: int = 500, repeats: int = 1, delta_time: float = 1,
+              seed: Optional[int] = None, processes: Optional[int] = None) -> List[dict]:
+    """
+    Returns:
+        Строка таблицы на каждую конфигурацию: значения параметров, число прогонов,
+        среднее и стандартное отклонение каждой метрики по повторам.
+
+    Raises:
+        ValueError: неизвестный параметр, значение вне допустимого диапазона,
+            слишком много прогонов или шагов муравьёв
+    """
+    unknown = set(parameters) - set(SWEEP_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Неизвестные параметры: {', '.join(sorted(unknown))}")
+    for name, values in parameters.items():
+        low, high = SWEEP_PARAMETERS[name]
+        if not values:
+            raise ValueError(f"Пустой список значений {name}")
+        for value in values:
+            if not (math.isfinite(value) and low <= value <= high):
+                raise ValueError(f"{name} должен быть в диапазоне [{low}, {high}]")
+            if name == "pheromone_delay" and value != int(value):
+                raise ValueError("pheromone_delay должен быть целым")
+
+    names = list(parameters)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(parameters[name] for name in names))]
+    if len(configs) * repeats > MAX_SWEEP_RUNS:
+        raise ValueError(f"Не более {MAX_SWEEP_RUNS} прогонов за раз")
+    if len(configs) * repeats * ticks * colony_size > MAX_SWEEP_ANT_UPDATES:
+        raise ValueError(f"Прогоны * ticks * colony_size не должно превышать {MAX_SWEEP_ANT_UPDATES}")
+
+    # одинаковые seed у повторов разных конфигураций - сравнение при общих случайных числах
+    seeds = [int(state) for state in np.random.SeedSequence(seed).generate_state(repeats)]
+    runs = [(config, run_seed) for config in configs for run_seed in seeds]
+
+    processes = min(processes or os.cpu_count() or 1, MAX_SWEEP_PROCESSES, len(runs))
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(_run_colony, home, colony_size, food_sources, config, ticks, delta_time, run_seed)
+                   for config, run_seed in runs]
+        results = [future.result() for future in futures]
+
+    table = []
+    for i, config in enumerate(configs):
+        metrics = results[i * repeats:(i + 1) * repeats]
+        row = {**config, "runs": repeats}
+        for name in metrics[0]:
+            values = np.array([run[name] for run in metrics], dtype=float)
+            row[f"{name}_mean"] = float(values.mean())
+            row[f"{name}_std"] = float(values.std())
+        table.append(row)
+    return table
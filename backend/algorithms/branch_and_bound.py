@@ -0,0 +1,270 @@
+"""
+Точное решение задачи коммивояжёра методом ветвей и границ.
+
+Нижняя граница - 1-дерево Хелда-Карпа с лагранжевыми штрафами вершин
+(субградиентный метод), ветвление по рёбрам вершины степени больше двух
+(схема Волгенанта-Йонкера). Верхняя граница берётся из переданного маршрута
+или строится эвристикой (ближайший сосед + 2-opt/Or-opt). При исчерпании
+лимита времени возвращается лучший найденный маршрут и доказанный разрыв
+до оптимума.
+"""
+
+from typing import List, Tuple, Optional, Callable
+import heapq
+import itertools
+import time
+import numpy as np
+
+from backend.algorithms.genetic_algorithm import distance_matrix, tour_lengths, check_routes
+from backend.algorithms.local_search import neighbor_lists, improve_route
+
+# ребро, обязательное в маршруте, выбирается в 1-дерево раньше всех остальных
+FORCED_BONUS = 1e9
+ROOT_ITERATIONS = 300
+NODE_ITERATIONS = 40
+STEP_PATIENCE = 20
+
+
+def _one_tree(weights: np.ndarray, forced: np.ndarray):
+    """
+    Минимальное 1-дерево: остовное дерево на вершинах 1..n-1 (Прим)
+    плюс два самых дешёвых ребра вершины 0.
+    forced: 1 - ребро обязательно, -1 - запрещено, 0 - свободно.
+    """
+    n = len(weights)
+    select = np.where(forced == 1, weights - FORCED_BONUS, weights)
+    select[forced == -1] = np.inf
+
+    in_tree = np.zeros(n, dtype=bool)
+    in_tree[:2] = True
+    best = select[1].copy()
+    parent = np.ones(n, dtype=np.intp)
+
+    edges = []
+    for _ in range(n - 2):
+        candidates = np.where(in_tree, np.inf, best)
+        vertex = int(np.argmin(candidates))
+        if candidates[vertex] == np.inf:
+            return None
+
+        edges.append((parent[vertex], vertex))
+        in_tree[vertex] = True
+        closer = select[vertex] < best
+        best[closer] = select[vertex][closer]
+        parent[closer] = vertex
+
+    row = select[0].copy()
+    cheapest = np.argpartition(row, 2)[:2]
+    if np.isinf(row[cheapest]).any():
+        return None
+    edges.extend((0, vertex) for vertex in cheapest)
+
+    edges = np.array(edges, dtype=np.intp)
+    value = float(weights[edges[:, 0], edges[:, 1]].sum())
+    degree = np.bincount(edges.ravel(), minlength=n)
+    return edges, value, degree
+
+
+def _lower_bound(distances: np.ndarray, forced: np.ndarray, pi: np.ndarray,
+                 upper: float, iterations: int):
+    """
+    Субградиентный подъём лагранжевой границы 1-дерева.
+    Возвращает (граница, рёбра 1-дерева, штрафы, является ли дерево маршрутом).
+    """
+    best = (-np.inf, None, pi, False)
+    step_scale = 2.0
+    stale = 0
+
+    for _ in range(iterations):
+        weights = distances + pi[:, None] + pi[None, :]
+        tree = _one_tree(weights, forced)
+        if tree is None:
+            return np.inf, None, pi, False
+
+        edges, value, degree = tree
+        bound = value - 2 * pi.sum()
+        subgradient = degree - 2
+
+        if not subgradient.any():
+            return bound, edges, pi, True
+        if bound > best[0]:
+            best = (bound, edges, pi, False)
+            stale = 0
+        else:
+            # шаг уменьшается вдвое, если граница давно не росла
+            stale += 1
+            if stale >= STEP_PATIENCE:
+                step_scale /= 2
+                stale = 0
+        if best[0] >= upper:
+            break
+
+        pi = pi + step_scale * (upper - bound) / (subgradient @ subgradient) * subgradient
+
+    return best
+
+
+def _path_end(forced: np.ndarray, prev: int, current: int):
+    # идём по обязательным рёбрам, пока путь не закончится
+    steps = 1
+    while True:
+        following = [v for v in np.flatnonzero(forced[current] == 1) if v != prev]
+        if not following:
+            return current, steps
+        prev, current = current, following[0]
+        steps += 1
+
+
+def _include(forced: np.ndarray, u: int, v: int) -> bool:
+    """Делает ребро обязательным и распространяет следствия. False - если узел недопустим."""
+    n = len(forced)
+    forced[u, v] = forced[v, u] = 1
+
+    for vertex in (u, v):
+        degree = np.count_nonzero(forced[vertex] == 1)
+        if degree > 2:
+            return False
+        if degree == 2:
+            free = forced[vertex] == 0
+            forced[vertex, free] = -1
+            forced[free, vertex] = -1
+
+    # запрещаем ребро, замыкающее цепочку обязательных рёбер раньше времени
+    start, count = _path_end(forced, v, u)
+    end, steps = _path_end(forced, u, v)
+    if count + steps < n and forced[start, end] == 0:
+        forced[start, end] = forced[end, start] = -1
+
+    return _is_feasible(forced)
+
+
+def _exclude(forced: np.ndarray, u: int, v: int) -> bool:
+    forced[u, v] = forced[v, u] = -1
+    return _is_feasible(forced)
+
+
+def _is_feasible(forced: np.ndarray) -> bool:
+    # у каждой вершины должно остаться хотя бы два незапрещённых ребра
+    return bool((np.count_nonzero(forced != -1, axis=1) >= 2).all())
+
+
+def _tour_from_edges(edges: np.ndarray, n: int) -> np.ndarray:
+    adjacency = [[] for _ in range(n)]
+    for u, v in edges:
+        adjacency[u].append(v)
+        adjacency[v].append(u)
+
+    route = [0, adjacency[0][0]]
+    while len(route) < n:
+        prev, current = route[-2], route[-1]
+        route.append(adjacency[current][0] if adjacency[current][0] != prev else adjacency[current][1])
+    return np.array(route, dtype=np.intp)
+
+
+def heuristic_route(points: List[Tuple[float, float]], distances: np.ndarray) -> np.ndarray:
+    # ближайший сосед, затем 2-opt и Or-opt
+    n = len(points)
+    visited = np.zeros(n, dtype=bool)
+    route = [0]
+    visited[0] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, distances[route[-1]])
+        route.append(int(np.argmin(row)))
+        visited[route[-1]] = True
+
+    return improve_route(np.array(route, dtype=np.intp), distances, neighbor_lists(points))
+
+
+def branch_and_bound(points: List[Tuple[float, float]], time_limit: float = 10.0,
+                     initial_route: Optional[List[int]] = None,
+                     progress: Optional[Callable[[float], None]] = None):
+    """
+    Args:
+        points: координаты городов
+        time_limit: лимит времени в секундах
+        initial_route: известный маршрут (например, лучший из ГА) как верхняя граница;
+            если это не перестановка городов, маршрут строится эвристикой
+        progress: получает долю израсходованного лимита времени
+
+    Returns:
+        Кортеж (маршрут, длина, {"lower_bound", "gap", "optimal", "nodes"})
+    """
+    started = time.monotonic()
+    n = len(points)
+    distances = distance_matrix(points)
+
+    if n <= 3:
+        route = np.arange(n)
+        length = float(tour_lengths(distances, route[None, :])[0]) if n else 0.0
+        return [points[i] for i in route], length, {"lower_bound": length, "gap": 0.0, "optimal": True, "nodes": 0}
+
+    best_route = None
+    if initial_route is not None:
+        # неверная верхняя граница отсекла бы все настоящие маршруты
+        try:
+            best_route = check_routes([initial_route], n)[0]
+        except ValueError:
+            best_route = None
+    if best_route is None:
+        best_route = heuristic_route(points, distances)
+    upper = float(tour_lengths(distances, best_route[None, :])[0])
+
+    forced = np.zeros((n, n), dtype=np.int8)
+    np.fill_diagonal(forced, -1)
+
+    counter = itertools.count()
+    open_nodes = []
+    nodes = 0
+
+    def evaluate(node_forced, pi, iterations):
+        nonlocal upper, best_route, nodes
+        nodes += 1
+        bound, edges, pi, is_tour = _lower_bound(distances, node_forced, pi, upper, iterations)
+        if is_tour and bound < upper:
+            best_route = _tour_from_edges(edges, n)
+            upper = float(tour_lengths(distances, best_route[None, :])[0])
+        elif not is_tour and bound < upper * (1 - 1e-9):
+            heapq.heappush(open_nodes, (bound, next(counter), node_forced, pi, edges))
+
+    evaluate(forced, np.zeros(n), ROOT_ITERATIONS)
+
+    while open_nodes and time.monotonic() - started < time_limit:
+        if progress is not None:
+            progress((time.monotonic() - started) / time_limit)
+        bound, _, node_forced, pi, edges = heapq.heappop(open_nodes)
+        if bound >= upper * (1 - 1e-9):
+            continue
+
+        # ветвимся по вершине степени больше двух и её свободным рёбрам в 1-дереве
+        degree = np.bincount(edges.ravel(), minlength=n)
+        vertex = int(np.argmax(degree))
+        incident = [int(u if v == vertex else v) for u, v in edges if vertex in (u, v)]
+        free = [u for u in incident if node_forced[vertex, u] == 0]
+        forced_count = np.count_nonzero(node_forced[vertex] == 1)
+
+        first, second = free[0], free[1] if len(free) > 1 else None
+
+        child = node_forced.copy()
+        if _exclude(child, vertex, first):
+            evaluate(child, pi, NODE_ITERATIONS)
+
+        if forced_count == 0 and second is not None:
+            child = node_forced.copy()
+            if _include(child, vertex, first) and _exclude(child, vertex, second):
+                evaluate(child, pi, NODE_ITERATIONS)
+
+            child = node_forced.copy()
+            if _include(child, vertex, first) and _include(child, vertex, second):
+                evaluate(child, pi, NODE_ITERATIONS)
+        else:
+            child = node_forced.copy()
+            if _include(child, vertex, first):
+                evaluate(child, pi, NODE_ITERATIONS)
+
+    lower = min(open_nodes[0][0], upper) if open_nodes else upper
+    return [points[i] for i in best_route], upper, {
+        "lower_bound": float(lower),
+        "gap": float((upper - lower) / upper) if upper > 0 else 0.0,
+        "optimal": bool(lower >= upper * (1 - 1e-9)),
+        "nodes": nodes
+    }
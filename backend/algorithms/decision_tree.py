@@ -3,19 +3,652 @@ A complete implementation of CART (Classification and Regression Trees)
 algorithm.
 
 This module contains:
-- Decision tree construction with recursive binary splitting
+- Decision tree construction with iterative binary splitting
 - Support for both classification and regression tasks
-- Cost-complexity pruning to prevent overfitting
-- CSV-based data loading and prediction
+- Native categorical splits and learned directions for missing values
+- Histogram mode training on quantile-binned features
+- Weakest-link cost-complexity pruning with the full alpha path
+- Chunked CSV loading into typed column arrays and prediction
+- Compiled flat-array tree form for fast prediction
+- Versioned binary model files loaded with memory mapping
 
 The implementation features automatic tree growing and pruning during
 initialization.
 """
 
 from typing import Union, Optional
+import ast
+import heapq
+import json
+import os
+import struct
+import zipfile
 import numpy as np
 import pandas as pd
 
+MODEL_FORMAT_VERSION = 3
+
+
+def read_csv_columns(
+    source,
+    sep: str = ',',
+    regression: bool = False,
+    chunk_size: int = 100_000
+) -> tuple:
+    """
+    Read training CSV in chunks into typed column arrays.
+
+    The last column is the target, all others are features. Columns that
+    are not numeric in the first chunk are categorical and stored as codes
+    into their category list; empty cells become NaN (missing).
+
+    Args:
+        source: Path or file object of CSV file
+        sep: CSV field separator character
+        regression: Keep target numeric instead of coding classes
+        chunk_size: Number of rows parsed at once
+
+    Returns:
+        Tuple of (features, target, feature_names, target_name, classes,
+        categories): float32 feature matrix, target as float64 for
+        regression or int32 codes into classes for classification (classes
+        is None for regression), list of category labels per feature (None
+        for numeric features)
+
+    Raises:
+        ValueError: If CSV has no rows, fewer than two columns or text in
+        a numeric column
+    """
+    feature_chunks, target_chunks = [], []
+    columns = None
+    lookups: list = []
+    for chunk in pd.read_csv(source, sep=sep, chunksize=chunk_size):
+        if columns is None:
+            columns = chunk.columns
+            lookups = [None if pd.api.types.is_numeric_dtype(chunk[name]) else {}
+                       for name in columns[:-1]]
+        block = np.empty((len(chunk), len(columns) - 1), dtype=np.float32)
+        for feat_idx, name in enumerate(columns[:-1]):
+            if lookups[feat_idx] is not None:
+                block[:, feat_idx] = _encode_categories(
+                    chunk[name], lookups[feat_idx], extend=True)
+                continue
+            try:
+                block[:, feat_idx] = pd.to_numeric(chunk[name])
+            except ValueError:
+                raise ValueError(f"Column {name} mixes numbers and text")
+        feature_chunks.append(block)
+        target_chunks.append(chunk.iloc[:, -1].to_numpy())
+
+    if columns is None or len(columns) < 2:
+        raise ValueError("CSV must contain feature columns and a target column")
+    features = np.concatenate(feature_chunks)
+    target = np.concatenate(target_chunks)
+    if len(target) == 0:
+        raise ValueError("CSV contains no rows")
+
+    feature_names = columns[:-1].tolist()
+    categories = [None if lookup is None else list(lookup) for lookup in lookups]
+    if regression:
+        return (features, target.astype(float), feature_names, columns[-1],
+                None, categories)
+    classes, codes = np.unique(target, return_inverse=True)
+    return (features, codes.astype(np.int32), feature_names, columns[-1],
+            classes, categories)
+
+
+def _encode_categories(
+    column: pd.Series,
+    lookup: dict,
+    extend: bool = False
+) -> np.ndarray:
+    """
+    Convert category labels to codes.
+
+    Labels are compared as strings, so a column parsed as numbers at
+    prediction time still matches the labels seen in training.
+
+    Args:
+        column: Column with category labels
+        lookup: Mapping of labels to codes
+        extend: Add unseen labels to lookup instead of treating them as
+        missing
+
+    Returns:
+        Float32 codes, NaN for missing and unknown labels
+    """
+    present = column.notna().to_numpy()
+    local_codes, labels = pd.factorize(column[present].astype(str))
+    if extend:
+        for label in labels:
+            lookup.setdefault(label, len(lookup))
+    label_codes = np.array([lookup.get(label, np.nan) for label in labels],
+                           dtype=np.float32)
+    codes = np.full(len(column), np.nan, dtype=np.float32)
+    codes[present] = label_codes[local_codes]
+    return codes
+
+
+def bin_features(
+    features: np.ndarray,
+    max_bins: int = 256,
+    categories: Optional[list] = None
+) -> tuple:
+    """
+    Bin every feature into at most max_bins - 1 bins plus a missing bin.
+
+    Numeric features get quantile bins. Upper bin edges are data values,
+    so x <= edges[b] exactly when the bin of x is <= b and binned splits
+    keep real thresholds. Categorical features get a bin per category;
+    when there are more categories than bins, the rarest ones share the
+    last bin. Missing values go to bin max_bins - 1.
+
+    Args:
+        features: Feature matrix
+        max_bins: Maximum number of bins per feature (3-256)
+        categories: Category labels per feature, None for numeric ones
+
+    Returns:
+        Tuple of (bins, edges): matrix of bin indices with dtype uint8 and
+        per feature either upper bin edges (numeric) or bins of category
+        codes (categorical)
+    """
+    bins = np.empty(features.shape, dtype=np.uint8)
+    bin_edges = []
+    missing_bin = max_bins - 1
+    quantiles = np.linspace(0, 1, missing_bin + 1)[1:-1]
+
+    for feat_idx in range(features.shape[1]):
+        column = features[:, feat_idx]
+        missing = np.isnan(column)
+        present = column[~missing]
+        if categories is not None and categories[feat_idx] is not None:
+            codes = present.astype(np.intp)
+            counts = np.bincount(codes, minlength=len(categories[feat_idx]))
+            order = np.argsort(-counts, kind='stable')
+            category_bins = np.empty(len(counts), dtype=np.uint8)
+            category_bins[order] = np.minimum(np.arange(len(counts)), missing_bin - 1)
+            bins[~missing, feat_idx] = category_bins[codes]
+            bin_edges.append(category_bins)
+        else:
+            unique = np.unique(present)
+            if len(unique) <= missing_bin:
+                edges = unique
+            else:
+                edges = np.unique(np.quantile(present, quantiles, method='lower'))
+                edges = np.append(edges[edges < unique[-1]], unique[-1])
+            bins[~missing, feat_idx] = np.searchsorted(edges[:-1], present, side='left')
+            bin_edges.append(edges)
+        bins[missing, feat_idx] = missing_bin
+    return bins, bin_edges
+
+
+def feature_matrix(
+    df: pd.DataFrame,
+    feature_names: list,
+    categories: Optional[list] = None,
+    dtype=np.float32
+) -> np.ndarray:
+    """
+    Extract features in training order.
+
+    Columns are matched by name when all feature names are present,
+    otherwise the first columns are taken in order. Categorical columns
+    are coded with the training categories, unknown ones become missing.
+
+    Args:
+        df: Data frame with prediction rows
+        feature_names: Feature names used in training
+        categories: Category labels per feature, None for numeric ones
+        dtype: Precision of the features the tree was grown on, float64
+        for trees whose thresholds did not come from float32 training data
+
+    Returns:
+        Feature matrix of the given dtype
+    """
+    if set(feature_names) <= set(df.columns):
+        df = df[feature_names]
+    else:
+        df = df.iloc[:, :len(feature_names)]
+    if categories is None or all(labels is None for labels in categories):
+        # same precision as in training, so rows equal to a threshold go
+        # the same way
+        return df.to_numpy(dtype=dtype)
+
+    features = np.empty(df.shape, dtype=dtype)
+    for feat_idx, labels in enumerate(categories):
+        column = df.iloc[:, feat_idx]
+        if labels is None:
+            features[:, feat_idx] = column.to_numpy(dtype=dtype)
+        else:
+            lookup = {label: code for code, label in enumerate(labels)}
+            features[:, feat_idx] = _encode_categories(column, lookup)
+    return features
+
+
+class CompiledTree:
+    """Decision tree stored as parallel arrays indexed by node number.
+
+    Node 0 is the root, nodes are numbered in preorder.
+
+    Attributes:
+        feature: Feature index of the split, -1 for leaves
+        threshold: Split threshold (left branch takes x <= threshold)
+        missing_left: Whether missing values take the left branch
+        category_offset: Start of the node category set in category_bits,
+        -1 for numeric splits
+        category_bits: Packed bit sets of category codes taking the left
+        branch, one per categorical split
+        left: Index of the left child, -1 for leaves
+        right: Index of the right child, -1 for leaves
+        value: Prediction of the node (as a leaf for internal nodes)
+        error: Node error used for pruning
+        subtree_size: Number of nodes in the subtree of every node
+        feature_names: Feature names in column order
+        categories: Category labels per feature, None for numeric ones
+        internal_values: Whether value is defined for internal nodes
+    """
+
+    ARRAY_FIELDS = ('feature', 'threshold', 'left', 'right', 'value',
+                    'error', 'subtree_size', 'missing_left',
+                    'category_offset', 'category_bits')
+
+    def __init__(
+        self,
+        tree: dict,
+        feature_names: list,
+        categories: Optional[list] = None
+    ):
+        """
+        Compile nested dict tree into flat arrays.
+
+        Args:
+            tree: Root node in the format produced by DecisionTree
+            feature_names: Feature names in column order
+            categories: Category labels per feature, None for numeric ones
+
+        Raises:
+            ValueError: If the tree references an unknown feature or
+            categories of a feature are not given
+        """
+        feature_index = {name: i for i, name in enumerate(feature_names)}
+        nodes = []
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            if not node['is_leaf']:
+                stack.append(node['right'])
+                stack.append(node['left'])
+
+        size = len(nodes)
+        self.feature = np.full(size, -1, dtype=np.int32)
+        self.threshold = np.zeros(size)
+        self.missing_left = np.zeros(size, dtype=bool)
+        self.category_offset = np.full(size, -1, dtype=np.int64)
+        self.left = np.full(size, -1, dtype=np.int32)
+        self.right = np.full(size, -1, dtype=np.int32)
+        self.error = np.array([node.get('error', 0.0) for node in nodes], dtype=float)
+
+        # in preorder the left child follows its parent and the right one
+        # follows the whole left subtree
+        subtree_sizes = np.ones(size, dtype=np.int32)
+        category_blocks, lookups = [], {}
+        bits_size = 0
+        for i in range(size - 1, -1, -1):
+            node = nodes[i]
+            if node['is_leaf']:
+                continue
+            left = i + 1
+            right = left + subtree_sizes[left]
+            subtree_sizes[i] += subtree_sizes[left] + subtree_sizes[right]
+            if node['feature_name'] not in feature_index:
+                raise ValueError(f"Unknown feature: {node['feature_name']}")
+            feat_idx = feature_index[node['feature_name']]
+            self.feature[i] = feat_idx
+            self.left[i], self.right[i] = left, right
+            # trees grown before missing value support sent NaN right
+            self.missing_left[i] = node.get('missing') == 'left'
+            if 'categories' not in node:
+                self.threshold[i] = node['threshold']
+                continue
+
+            if categories is None or categories[feat_idx] is None:
+                raise ValueError(
+                    f"Categories of feature {node['feature_name']} are unknown")
+            if feat_idx not in lookups:
+                lookups[feat_idx] = {label: code for code, label
+                                     in enumerate(categories[feat_idx])}
+            lookup = lookups[feat_idx]
+            is_left = np.zeros(len(lookup), dtype=bool)
+            is_left[[lookup[label] for label in node['categories']
+                     if label in lookup]] = True
+            block = np.packbits(is_left, bitorder='little')
+            self.category_offset[i] = bits_size
+            bits_size += len(block)
+            category_blocks.append(block)
+
+        self.subtree_size = subtree_sizes
+        self.category_bits = np.concatenate(category_blocks) if category_blocks\
+            else np.zeros(0, dtype=np.uint8)
+
+        # internal nodes carry values in trees grown by this version only
+        valued = [i for i, node in enumerate(nodes) if 'value' in node]
+        node_values = np.asarray([nodes[i]['value'] for i in valued])
+        self.value = np.zeros(size, dtype=node_values.dtype)
+        self.value[valued] = node_values
+        self.feature_names = list(feature_names)
+        self.categories = categories
+        self.internal_values = len(valued) == size
+        self._reset_caches()
+
+    @classmethod
+    def from_arrays(
+        cls,
+        arrays: dict,
+        feature_names: list,
+        internal_values: bool = True,
+        categories: Optional[list] = None
+    ) -> 'CompiledTree':
+        """Wrap existing node arrays without copying them.
+
+        Args:
+            arrays: Mapping with keys of ARRAY_FIELDS; missing value and
+            category arrays may be absent (numeric splits sending missing
+            values right)
+            feature_names: Feature names in column order
+            internal_values: Whether value is defined for internal nodes
+            categories: Category labels per feature, None for numeric ones
+
+        Returns:
+            Compiled tree using the given arrays (they may be memory-mapped)
+        """
+        size = len(arrays['feature'])
+        defaults = {
+            'missing_left': np.zeros(size, dtype=bool),
+            'category_offset': np.full(size, -1, dtype=np.int64),
+            'category_bits': np.zeros(0, dtype=np.uint8)
+        }
+        compiled = cls.__new__(cls)
+        for name in cls.ARRAY_FIELDS:
+            setattr(compiled, name, arrays[name] if name in arrays else defaults[name])
+        compiled.feature_names = list(feature_names)
+        compiled.categories = categories
+        compiled.internal_values = internal_values
+        compiled._reset_caches()
+        return compiled
+
+    def _reset_caches(self):
+        self._prune_alpha: Optional[np.ndarray] = None
+        self._pruning_path: Optional[dict] = None
+        self._paths: Optional[np.ndarray] = None
+        self._lists: Optional[tuple] = None
+        self._view: Optional[tuple] = None
+
+    @property
+    def paths(self) -> np.ndarray:
+        """Binary path from the root to every node ("0" - left)."""
+        if self._paths is None:
+            paths = [""] * len(self.feature)
+            left, right = self.left.tolist(), self.right.tolist()
+            for i in np.flatnonzero(self.feature >= 0).tolist():
+                paths[left[i]] = paths[i] + "0"
+                paths[right[i]] = paths[i] + "1"
+            self._paths = np.array(paths, dtype=object)
+        return self._paths
+
+    def split_features(self, ccp_alpha: float = 0.0) -> np.ndarray:
+        """Split features of the tree pruned at ccp_alpha.
+
+        Nodes whose effective alpha is <= ccp_alpha act as leaves, so any
+        alpha of the pruning path is applied without copying the tree.
+
+        Args:
+            ccp_alpha: Complexity parameter (0 = the full tree)
+
+        Returns:
+            Copy of feature with -1 for collapsed nodes (feature itself
+            when nothing is pruned)
+
+        Raises:
+            ValueError: If pruning is requested but internal nodes carry no
+            values
+        """
+        ccp_alpha = max(float(ccp_alpha), 0.0)
+        if self._view is None or self._view[0] != ccp_alpha:
+            feature = self.feature
+            if ccp_alpha > 0:
+                if not self.internal_values:
+                    raise ValueError("Tree has no values in internal nodes, "
+                                     "rebuild it to prune")
+                feature = np.where(self.prune_alpha <= ccp_alpha, -1, feature).astype(np.int32)
+            self._view = (ccp_alpha, feature, None)
+        return self._view[1]
+
+    def apply(self, features: np.ndarray, ccp_alpha: float = 0.0) -> int:
+        """Find the leaf reached by a single feature vector.
+
+        Args:
+            features: Feature vector
+            ccp_alpha: Complexity parameter of the pruned view to walk
+
+        Returns:
+            Index of the leaf node
+        """
+        if self._lists is None:
+            # plain lists are faster than numpy scalars for walking a
+            # single row
+            self._lists = (self.threshold.tolist(),
+                           self.left.tolist(), self.right.tolist(),
+                           self.missing_left.tolist(),
+                           self.category_offset.tolist())
+        split_features = self.split_features(ccp_alpha)
+        if self._view[2] is None:
+            self._view = self._view[:2] + (split_features.tolist(),)
+        feature = self._view[2]
+        threshold, left, right, missing_left, offset = self._lists
+        row = np.asarray(features, dtype=float).tolist()
+        node = 0
+        while feature[node] >= 0:
+            x = row[feature[node]]
+            if x != x:
+                go_left = missing_left[node]
+            elif offset[node] >= 0:
+                code = int(x)
+                go_left = self.category_bits[offset[node] + (code >> 3)] >> (code & 7) & 1
+            else:
+                go_left = x <= threshold[node]
+            node = left[node] if go_left else right[node]
+        return node
+
+    def apply_batch(self, features: np.ndarray, ccp_alpha: float = 0.0) -> np.ndarray:
+        """Find the leaves reached by all rows at once.
+
+        Rows move down one level per iteration, so the number of
+        iterations equals the tree depth.
+
+        Args:
+            features: Feature matrix
+            ccp_alpha: Complexity parameter of the pruned view to walk
+
+        Returns:
+            Array of leaf indices, one per row
+        """
+        split_features = self.split_features(ccp_alpha)
+        nodes = np.zeros(len(features), dtype=np.int32)
+        active = np.arange(len(features))
+        while len(active):
+            current = nodes[active]
+            is_internal = split_features[current] >= 0
+            active, current = active[is_internal], current[is_internal]
+            x = features[active, split_features[current]]
+            go_left = x <= self.threshold[current]
+            missing = np.isnan(x)
+            offset = self.category_offset[current]
+            categorical = (offset >= 0) & ~missing
+            if categorical.any():
+                codes = x[categorical].astype(np.int64)
+                bits = self.category_bits[offset[categorical] + (codes >> 3)]
+                go_left[categorical] = (bits >> (codes & 7)) & 1 == 1
+            if missing.any():
+                go_left[missing] = self.missing_left[current[missing]]
+            nodes[active] = np.where(go_left, self.left[current], self.right[current])
+        return nodes
+
+    def pruning_path(self) -> dict:
+        """Compute the weakest-link pruning sequence in a single pass.
+
+        Internal nodes are collapsed in order of their effective alpha
+        g(t) = (R(t) - R(T_t)) / (|leaves(T_t)| - 1), kept in a heap. After
+        a collapse only the ancestors of the node are updated, so the whole
+        sequence costs O(nodes * depth * log nodes). The alpha at which
+        every node becomes a leaf is remembered for prune_alpha.
+
+        Returns:
+            Dictionary with increasing 'ccp_alphas' and total leaf error
+            ('impurities') and leaf count ('n_leaves') of the pruned tree
+            at every alpha
+        """
+        if self._pruning_path is not None:
+            return self._pruning_path
+
+        size = len(self.feature)
+        internal = np.flatnonzero(self.feature >= 0)
+        parent = np.full(size, -1, dtype=np.int64)
+        parent[self.left[internal]] = internal
+        parent[self.right[internal]] = internal
+
+        error = self.error.tolist()
+        left, right = self.left.tolist(), self.right.tolist()
+        subtree_error = list(error)
+        leaves = [1] * size
+        for i in internal[::-1].tolist():
+            subtree_error[i] = subtree_error[left[i]] + subtree_error[right[i]]
+            leaves[i] = leaves[left[i]] + leaves[right[i]]
+
+        def link(i):
+            return (error[i] - subtree_error[i]) / (leaves[i] - 1)
+
+        version = [0] * size
+        heap = [(link(i), i, 0) for i in internal.tolist()]
+        heapq.heapify(heap)
+        removed = np.zeros(size, dtype=bool)
+        prune_alpha = np.full(size, np.inf)
+        parent = parent.tolist()
+
+        alphas, impurities, n_leaves = [0.0], [subtree_error[0]], [leaves[0]]
+        while heap:
+            g, i, node_version = heapq.heappop(heap)
+            if node_version != version[i] or removed[i]:
+                continue
+
+            # equal links may differ by rounding of the summed errors
+            alpha = g if g > alphas[-1] * (1 + 1e-9) + 1e-15 else alphas[-1]
+            prune_alpha[i] = alpha
+            removed[i:i + self.subtree_size[i]] = True
+            error_change = error[i] - subtree_error[i]
+            leaves_change = leaves[i] - 1
+            subtree_error[i], leaves[i] = error[i], 1
+
+            ancestor = parent[i]
+            while ancestor >= 0:
+                subtree_error[ancestor] += error_change
+                leaves[ancestor] -= leaves_change
+                version[ancestor] += 1
+                heapq.heappush(heap, (link(ancestor), ancestor, version[ancestor]))
+                ancestor = parent[ancestor]
+
+            # nodes collapsing at the same alpha form one step of the path
+            if alpha > alphas[-1]:
+                alphas.append(alpha)
+                impurities.append(subtree_error[0])
+                n_leaves.append(leaves[0])
+            else:
+                impurities[-1], n_leaves[-1] = subtree_error[0], leaves[0]
+
+        self._prune_alpha = prune_alpha
+        self._pruning_path = {
+            'ccp_alphas': alphas,
+            'impurities': impurities,
+            'n_leaves': n_leaves
+        }
+        return self._pruning_path
+
+    @property
+    def prune_alpha(self) -> np.ndarray:
+        """Alpha at which every node becomes a leaf (inf for leaves)."""
+        self.pruning_path()
+        return self._prune_alpha
+
+    def to_dict(self) -> dict:
+        """Export tree as nested dicts in the format used by the visualizer.
+
+        Returns:
+            Root node of the tree
+        """
+        paths = self.paths
+        root: dict = {}
+        stack = [(0, root)]
+        while stack:
+            i, node = stack.pop()
+            value = self.value[i].item()
+            if self.feature[i] < 0:
+                node.update({
+                    'value': value,
+                    'error': float(self.error[i]),
+                    'is_leaf': True,
+                    'path': paths[i]
+                })
+                continue
+
+            left, right = {}, {}
+            node['feature_name'] = self.feature_names[self.feature[i]]
+            if self.category_offset[i] >= 0:
+                node['categories'] = self.left_categories(i)
+            else:
+                node['threshold'] = float(self.threshold[i])
+            node.update({
+                'missing': 'left' if self.missing_left[i] else 'right',
+                'left': left,
+                'right': right,
+                'error': float(self.error[i])
+            })
+            if self.internal_values:
+                node['value'] = value
+            node.update({'is_leaf': False, 'path': paths[i]})
+            stack.append((int(self.right[i]), right))
+            stack.append((int(self.left[i]), left))
+        return root
+
+    def left_categories(self, node: int) -> list:
+        """Category labels taking the left branch of a categorical split.
+
+        Args:
+            node: Index of the node
+
+        Returns:
+            Category labels in code order
+        """
+        labels = self.categories[self.feature[node]]
+        start = self.category_offset[node]
+        is_left = np.unpackbits(self.category_bits[start:start + (len(labels) + 7) // 8],
+                                count=len(labels), bitorder='little')
+        return [labels[code] for code in np.flatnonzero(is_left).tolist()]
+
+    def leaf(self, node: int) -> dict:
+        """Prediction result for a leaf node.
+
+        Args:
+            node: Index of the leaf
+
+        Returns:
+            Dictionary with predicted value and path to the leaf
+        """
+        return {
+            'value': self.value[node].item(),
+            'path': self.paths[node]
+        }
+
 
 class DecisionTree:
     """Decision tree implementation using CART algorithm with automatic
@@ -24,8 +657,18 @@ class DecisionTree:
     Attributes:
         regression: Boolean flag for regression tasks (False for
         classification)
-        ccp_alpha: Complexity parameter for cost-complexity pruning
-        tree: The constructed decision tree structure
+        ccp_alpha: Complexity parameter for cost-complexity pruning,
+        applied as a view over the full tree when predicting and exporting
+        histogram: Whether training uses quantile-binned features
+        max_bins: Maximum number of bins per feature in histogram mode
+        max_depth: Maximum depth of the tree
+        max_features: Number of features considered at every split
+        categories: Category labels per feature, None for numeric ones
+        float32_features: Whether the tree was grown on float32 features,
+        so prediction rows are compared in the same precision; legacy and
+        posted trees without this marker are compared in float64
+        tree: The full grown tree structure
+        compiled: Flat-array form of tree, rebuilt when tree changes
         _y_dtype: Data type of target variable
         _num_samples: Number of samples in training data
     """
@@ -33,7 +676,12 @@ class DecisionTree:
     def __init__(
         self,
         regression: bool = False,
-        ccp_alpha: float = 0.01
+        ccp_alpha: float = 0.01,
+        histogram: bool = False,
+        max_bins: int = 256,
+        max_depth: Optional[int] = None,
+        max_features: Optional[int] = None,
+        seed=None
     ):
         """
         Initialize and build decision tree from CSV data.
@@ -42,31 +690,161 @@ class DecisionTree:
             csv_path: Path to training data CSV file
             regression: Whether to perform regression (default: classification)
             ccp_alpha: Complexity parameter for pruning (0 = no pruning)
+            histogram: Train on quantile-binned features (faster, splits
+            only at bin edges)
+            max_bins: Number of bins per feature in histogram mode (3-256),
+            one of them is reserved for missing values
+            max_depth: Maximum depth of the tree (None = unlimited)
+            max_features: Number of randomly chosen features considered
+            at every split (None = all)
+            seed: Seed or numpy Generator for feature sampling
             sep: CSV field separator character
 
         Raises:
             ValueError: If CSV data is invalid or missing
         """
+        if not 3 <= max_bins <= 256:
+            raise ValueError("max_bins must be between 3 and 256")
         self.regression = regression
         self.ccp_alpha = ccp_alpha
+        self.histogram = histogram
+        self.max_bins = max_bins
+        self.max_depth = max_depth
+        self.max_features = max_features
+        self.rng = np.random.default_rng(seed)
         self.tree: Optional[dict] = None
         self._y_dtype: Optional[type] = None
         self._num_samples: Optional[int] = None
         self.feature_names: Optional[list] = None
         self.target_name: Optional[str] = None
+        self.categories: Optional[list] = None
+        self.float32_features = False
+        self._bin_edges: Optional[list] = None
+        self._classes: Optional[np.ndarray] = None
+        self._compiled: Optional[CompiledTree] = None
+        self._compiled_source: Optional[dict] = None
+
+    @property
+    def compiled(self) -> CompiledTree:
+        """Compiled form of the current tree, cached until tree changes."""
+        if self._compiled is None or self._compiled_source is not self.tree:
+            self._compiled = CompiledTree(self.tree, self.feature_names, self.categories)
+            self._compiled_source = self.tree
+        return self._compiled
+
+    def build_tree(self, csv_path, sep: str = ','):
+        """Complete tree construction pipeline from CSV data.
 
-    def build_tree(self, csv_path: str, sep: str = ','):
-        """Complete tree construction pipeline from CSV data."""
-        df = pd.read_csv(csv_path, sep=sep)
-        self.feature_names = df.columns[:-1].tolist()
-        self.target_name = df.columns[-1]
-        features = df.iloc[:, :-1].values.astype(float)
-        target = df.iloc[:, -1].values
-        self._y_dtype = target.dtype
-        self._num_samples = len(target)
-        self.tree = self._grow_tree(features, target)
+        Args:
+            csv_path: Path or file object of training CSV file
+            sep: CSV field separator character
+        """
+        self.fit(*read_csv_columns(csv_path, sep, self.regression))
+
+    def fit(
+        self,
+        features: np.ndarray,
+        target: np.ndarray,
+        feature_names: list,
+        target_name: str,
+        classes: Optional[np.ndarray] = None,
+        categories: Optional[list] = None,
+        sample_indices: Optional[np.ndarray] = None,
+        binned: Optional[tuple] = None
+    ):
+        """Build tree from column arrays.
+
+        Args:
+            features: Feature matrix, NaN marks missing values
+            target: Target vector, class codes if classes are given
+            feature_names: Feature names in column order
+            target_name: Name of target variable
+            classes: Class labels indexed by target codes
+            categories: Category labels per feature (None for numeric
+            features); categorical columns hold codes into them
+            sample_indices: Rows to train on, may repeat (bootstrap);
+            all rows by default
+            binned: Precomputed result of bin_features for histogram mode
+        """
+        self.feature_names = list(feature_names)
+        self.target_name = target_name
+        self._classes = classes
+        self.categories = categories
+        self.float32_features = features.dtype == np.float32
+        self._y_dtype = target.dtype if classes is None else classes.dtype
+        if sample_indices is None:
+            sample_indices = np.arange(len(target))
+        self._num_samples = len(sample_indices)
+
+        bins = None
+        if self.histogram:
+            bins, self._bin_edges = binned if binned is not None\
+                else bin_features(features, self.max_bins, categories)
+        # the full tree is kept, so any alpha of the pruning path can be
+        # applied later without retraining
+        self.tree = self._grow_tree(features, target, bins, sample_indices)
+
+    def pruning_path(self) -> dict:
+        """Cost-complexity pruning path of the current tree.
+
+        Returns:
+            Dictionary with 'ccp_alphas', 'impurities' and 'n_leaves',
+            see CompiledTree.pruning_path
+        """
+        return self.compiled.pruning_path()
+
+    def export_tree(self) -> dict:
+        """Tree pruned at the model ccp_alpha in the nested dict format.
+
+        Returns:
+            Root node of the tree used for prediction
+        """
         if self.ccp_alpha > 0:
-            self.tree = self._prune_tree(self.tree)
+            return self.pruned(self.ccp_alpha)
+        return self.tree if self.tree is not None else self.compiled.to_dict()
+
+    def pruned(self, ccp_alpha: float) -> dict:
+        """Build the smallest minimal cost-complexity subtree for alpha.
+
+        The current tree is not modified, so any alpha can be applied to
+        the same grown tree without retraining.
+
+        Args:
+            ccp_alpha: Complexity parameter, nodes whose effective alpha
+            is <= ccp_alpha become leaves
+
+        Returns:
+            Root node of the pruned tree
+
+        Raises:
+            ValueError: If internal nodes of the tree carry no values
+        """
+        compiled = self.compiled
+        prune_alpha = compiled.prune_alpha
+        tree = self.tree if self.tree is not None else compiled.to_dict()
+        root: dict = {}
+        stack = [(tree, root, 0)]
+        while stack:
+            node, pruned, i = stack.pop()
+            if node['is_leaf']:
+                pruned.update(node)
+            elif prune_alpha[i] <= ccp_alpha:
+                if 'value' not in node:
+                    raise ValueError("Tree has no values in internal nodes, "
+                                     "rebuild it to prune")
+                pruned.update({
+                    'value': node['value'],
+                    'error': node['error'],
+                    'is_leaf': True,
+                    'path': node['path']
+                })
+            else:
+                left, right = {}, {}
+                pruned.update(node)
+                pruned['left'], pruned['right'] = left, right
+                stack.append((node['right'], right, int(compiled.right[i])))
+                stack.append((node['left'], left, int(compiled.left[i])))
+        return root
 
     def predict(self, csv_path: str, sep: str = ',') -> dict:
         """
@@ -77,65 +855,139 @@ class DecisionTree:
             sep: CSV field separator character
 
         Returns:
-            Predicted value (float for regression, int for classification)
+            Dictionary with predicted value (float for regression, class
+            label for classification) and path to the leaf
         """
         df = pd.read_csv(csv_path, sep=sep)
 
-        features = df.values.astype(float)
-        return self._traverse_tree(features[0], self.tree)
+        features = self._feature_matrix(df)
+        compiled = self.compiled
+        return compiled.leaf(compiled.apply(features[0], self.ccp_alpha))
+
+    def predict_batch(self, csv_path, sep: str = ',', chunk_size: int = 65536):
+        """
+        Route every row of CSV file through the compiled tree.
+
+        The file is parsed chunk_size rows at a time, so memory does not
+        grow with the number of rows.
+
+        Args:
+            csv_path: Path or file object of CSV file with prediction rows
+            sep: CSV field separator character
+            chunk_size: Number of rows parsed and routed at once
+
+        Yields:
+            Array of leaf indices in compiled tree pruned at ccp_alpha,
+            one per row of the chunk
+        """
+        compiled = self.compiled
+        for df in pd.read_csv(csv_path, sep=sep, chunksize=chunk_size):
+            yield compiled.apply_batch(self._feature_matrix(df), self.ccp_alpha)
+
+    def _feature_matrix(self, df: pd.DataFrame) -> np.ndarray:
+        """Prediction rows in the precision the tree was grown on."""
+        dtype = np.float32 if self.float32_features else np.float64
+        return feature_matrix(df, self.feature_names, self.categories, dtype)
 
     def _grow_tree(
         self,
         features: np.ndarray,
         target: np.ndarray,
-        path: str = ""
+        bins: Optional[np.ndarray] = None,
+        indices: Optional[np.ndarray] = None
     ) -> dict:
-        """Recursively build decision tree from training data."""
-        if self._is_pure(target):
-            return self._create_leaf_node(target, path)
-
-        split_name, split_thr = self._find_optimal_split(features, target)
-        if split_name is None:
-            return self._create_leaf_node(target, path)
+        """Build decision tree from training data without recursion.
 
-        split_idx = self.feature_names.index(split_name)
-        left_mask = features[:, split_idx] <= split_thr
-        left = self._grow_tree(
-            features[left_mask], target[left_mask], path + "0")
-        right = self._grow_tree(
-            features[~left_mask], target[~left_mask], path + "1")
-
-        return {
-            'feature_name': split_name,
-            'threshold': split_thr,
-            'left': left,
-            'right': right,
-            'error': self._calculate_node_error(target),
-            'is_leaf': False,
-            'path': path
-        }
-
-    def _prune_tree(self, node: dict) -> dict:
-        """Recursively prune tree using cost-complexity pruning.
+        Every node owns a contiguous range of a single sample index
+        permutation, which is partitioned in place when the node is split,
+        so no per-node copies of the dataset are made.
 
         Args:
-            node: Current node to consider for pruning
+            features: Feature matrix
+            target: Target vector
+            bins: Binned feature matrix for histogram mode
+            indices: Training rows, all by default
 
         Returns:
-            Pruned node structure
+            Root node of the tree
         """
-        if node['is_leaf']:
-            return node
-
-        node['left'] = self._prune_tree(node['left'])
-        node['right'] = self._prune_tree(node['right'])
-
-        if node['left']['is_leaf'] and node['right']['is_leaf']:
-            pruning_gain = self._calculate_pruning_gain(node)
-            if pruning_gain < self.ccp_alpha:
-                return self._merge_leaf_nodes(node)
-
-        return node
+        stats = self._target_stats(target)
+        indices = np.arange(len(target)) if indices is None\
+            else np.array(indices)
+        root: dict = {}
+        # (node to fill, start, end, depth, path bits, node histogram)
+        stack = [(root, 0, len(indices), 0, 0, None)]
+
+        while stack:
+            node, start, end, depth, bits, hist = stack.pop()
+            node_idx = indices[start:end]
+            node_target = target[node_idx]
+            path = format(bits, f'0{depth}b') if depth else ""
+
+            split = None
+            can_split = self.max_depth is None or depth < self.max_depth
+            if can_split and not self._is_pure(node_target):
+                candidates = self._candidate_features(features.shape[1])
+                if bins is None:
+                    split = self._find_optimal_split(
+                        features, stats, node_idx, candidates)
+                else:
+                    if hist is None:
+                        hist = self._histogram(bins[node_idx], stats[node_idx])
+                    split = self._find_binned_split(hist, candidates)
+            if split is None:
+                node.update(self._create_leaf_node(node_target, path))
+                continue
+
+            feat_idx, rule, missing_left = split
+            column = features[node_idx, feat_idx]
+            if self._is_categorical(feat_idx):
+                left_mask = np.isin(column, rule)
+            else:
+                left_mask = column <= rule
+            missing = np.isnan(column)
+            if missing.any():
+                left_mask[missing] = missing_left
+            middle = start + int(left_mask.sum())
+            if not missing.any():
+                # no missing values seen here, send them with the majority
+                missing_left = middle - start >= end - middle
+            indices[start:end] = np.concatenate(
+                (node_idx[left_mask], node_idx[~left_mask]))
+
+            left_hist = right_hist = None
+            if bins is not None:
+                # histogram only the smaller child, the other is the
+                # parent minus its sibling
+                if middle - start <= end - middle:
+                    small_idx = indices[start:middle]
+                    left_hist = self._histogram(bins[small_idx], stats[small_idx])
+                    right_hist = hist - left_hist
+                else:
+                    small_idx = indices[middle:end]
+                    right_hist = self._histogram(bins[small_idx], stats[small_idx])
+                    left_hist = hist - right_hist
+
+            left, right = {}, {}
+            node['feature_name'] = self.feature_names[feat_idx]
+            if self._is_categorical(feat_idx):
+                labels = self.categories[feat_idx]
+                node['categories'] = [labels[code] for code in rule.tolist()]
+            else:
+                node['threshold'] = float(rule)
+            node.update({
+                'missing': 'left' if missing_left else 'right',
+                'left': left,
+                'right': right,
+                'error': self._calculate_node_error(node_target),
+                'value': self._calculate_leaf_value(node_target),
+                'is_leaf': False,
+                'path': path
+            })
+            stack.append((right, middle, end, depth + 1, bits * 2 + 1, right_hist))
+            stack.append((left, start, middle, depth + 1, bits * 2, left_hist))
+
+        return root
 
     def _create_leaf_node(self, target: np.ndarray, path: str) -> dict:
         """Create leaf node structure.
@@ -154,75 +1006,264 @@ class DecisionTree:
             'path': path
         }
 
-    def _merge_leaf_nodes(self, node: dict) -> dict:
-        """Merge child leaf nodes into single leaf.
+    def _find_optimal_split(
+        self,
+        features: np.ndarray,
+        stats: np.ndarray,
+        indices: np.ndarray,
+        candidates: np.ndarray
+    ) -> Optional[tuple]:
+        """Find optimal feature and split rule for node split.
+
+        Each numeric feature is sorted once, then the costs of all
+        thresholds are evaluated in one pass over cumulative statistics,
+        so a node costs O(features * n log n). Categories of a categorical
+        feature are sorted by their target statistic and scanned the same
+        way, so only prefixes of that order are tried instead of all
+        subsets. Samples with a missing value are tried on both sides.
 
         Args:
-            node: Parent node with two leaf children
+            features: Feature matrix of the whole training set
+            stats: Target statistics from _target_stats
+            indices: Indices of the node samples
+            candidates: Indices of features to consider
 
         Returns:
-            New merged leaf node
+            Tuple of (feature_index, rule, missing_left) where rule is the
+            threshold for numeric features and the array of category codes
+            taking the left branch for categorical ones, None if no feature
+            can split the node
         """
-        merged_values = np.array(
-            [node['left']['value'], node['right']['value']]
-        )
-        if self.regression:
-            return self._create_leaf_node(merged_values, node['path'])
-        return self._create_leaf_node(
-            np.concatenate(merged_values), node['path']
-        )
-
-    def _find_optimal_split(
+        best_cost = np.inf
+        best_split = None
+        node_stats = stats[indices]
+        total = node_stats.sum(axis=0)
+
+        for feat_idx in candidates:
+            column = features[indices, feat_idx]
+            missing = np.isnan(column)
+            column_stats = node_stats
+            missing_stats = np.zeros_like(total)
+            if missing.any():
+                column, column_stats = column[~missing], node_stats[~missing]
+                missing_stats = total - column_stats.sum(axis=0)
+            if len(column) == 0:
+                continue
+
+            if self._is_categorical(feat_idx):
+                codes, inverse = np.unique(column.astype(np.intp), return_inverse=True)
+                ordered = np.column_stack([
+                    np.bincount(inverse, weights=column_stats[:, i], minlength=len(codes))
+                    for i in range(column_stats.shape[1])])
+                order = self._category_order(ordered)
+                costs = self._scan_costs(ordered[order][None], missing_stats[None], total)[0]
+            else:
+                order = np.argsort(column, kind='stable')
+                column = column[order]
+                costs = self._scan_costs(column_stats[order][None], missing_stats[None], total)[0]
+                # threshold between equal values does not split anything
+                costs[:-1][column[:-1] == column[1:]] = np.inf
+
+            pos, missing_left = np.unravel_index(np.argmin(costs), costs.shape)
+            if costs[pos, missing_left] < best_cost:
+                best_cost = costs[pos, missing_left]
+                rule = np.sort(codes[order[:pos + 1]]) if self._is_categorical(feat_idx)\
+                    else column[pos]
+                best_split = (int(feat_idx), rule, bool(missing_left))
+
+        return best_split
+
+    def _scan_costs(
         self,
-        features: np.ndarray,
-        target: np.ndarray
-    ) -> tuple:
-        """Find optimal feature and threshold for node split.
+        ordered: np.ndarray,
+        missing: np.ndarray,
+        total: np.ndarray
+    ) -> np.ndarray:
+        """Costs of splitting ordered values after every position.
 
         Args:
-            features: Feature matrix
-            target: Target vector
+            ordered: Statistics of values in scan order, shape
+            (features, positions, stats)
+            missing: Statistics of samples with missing values, shape
+            (features, stats)
+            total: Statistics summed over the whole node
 
         Returns:
-            Tuple of (best_feature_name, best_threshold)
+            Costs of shape (features, positions, 2), the last axis sends
+            missing values right (0) or left (1)
         """
-        best_cost = np.inf
-        best_idx, best_thr = None, None
-        cost_func = self._calculate_mse if self.regression\
-            else self._calculate_gini
+        left = np.cumsum(ordered, axis=1)
+        shape, num_stats = left.shape[:2], left.shape[2]
+        costs = np.empty(shape + (2,))
+        costs[..., 0] = self._split_costs(left.reshape(-1, num_stats), total).reshape(shape)
+        if missing.any():
+            left += missing[:, None]
+            costs[..., 1] = self._split_costs(left.reshape(-1, num_stats), total).reshape(shape)
+        else:
+            costs[..., 1] = np.inf
+        return costs
+
+    def _category_order(self, stats: np.ndarray) -> np.ndarray:
+        """Order categories by their target statistic.
+
+        For regression and two classes the best split is a prefix of this
+        order (Breiman et al.); for more classes it is a heuristic.
 
-        for feat_idx, feat_name in enumerate(self.feature_names):
-            thresholds = np.unique(features[:, feat_idx])
-            for thr in thresholds:
-                left_mask: np.ndarray = features[:, feat_idx] <= thr
-                if left_mask.sum() == 0 or (~left_mask).sum() == 0:
-                    continue
+        Args:
+            stats: Summed target statistics per category, shape
+            (categories, stats)
 
-                cost = self._calculate_split_cost(target, left_mask, cost_func)
-                if cost < best_cost:
-                    best_cost, best_idx, best_thr = cost, feat_idx, thr
+        Returns:
+            Category positions by increasing mean target (regression) or
+            share of the most frequent node class (classification), empty
+            categories last
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if self.regression:
+                statistic = stats[:, 1] / stats[:, 0]
+            else:
+                majority = int(stats.sum(axis=0).argmax())
+                statistic = stats[:, majority] / stats.sum(axis=1)
+        return np.argsort(statistic, kind='stable')
 
-        return self.feature_names[best_idx], best_thr
+    def _is_categorical(self, feat_idx: int) -> bool:
+        """Check if feature holds category codes.
 
-    def _calculate_split_cost(
-        self,
-        target: np.ndarray,
-        mask: np.ndarray,
-        cost_func: callable
-    ) -> float:
-        """Calculate weighted cost for potential split.
+        Args:
+            feat_idx: Feature index
+
+        Returns:
+            True for categorical features
+        """
+        return self.categories is not None and self.categories[feat_idx] is not None
+
+    def _target_stats(self, target: np.ndarray) -> np.ndarray:
+        """Per-sample statistics whose sums define split costs.
 
         Args:
             target: Target values
-            mask: Boolean mask for left split
-            cost_func: Cost function (gini or mse)
 
         Returns:
-            Weighted cost of split
+            Matrix (n, 3) of [1, y, y^2] for regression, one-hot class
+            matrix (n, classes) for classification
+        """
+        if self.regression:
+            values = target.astype(float)
+            return np.column_stack((np.ones_like(values), values, values ** 2))
+
+        _, codes = np.unique(target, return_inverse=True)
+        one_hot = np.zeros((len(codes), codes.max() + 1))
+        one_hot[np.arange(len(codes)), codes] = 1
+        return one_hot
+
+    def _split_costs(self, left: np.ndarray, total: np.ndarray) -> np.ndarray:
+        """Calculate weighted cost of splits from summed target statistics.
+
+        Args:
+            left: Statistics summed over the left part of every candidate
+            split, shape (splits, stats)
+            total: Statistics summed over the whole node
+
+        Returns:
+            Array of split costs, inf where a part is empty
+        """
+        right = total - left
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if self.regression:
+                left_sizes, right_sizes = left[:, 0], right[:, 0]
+                # sum of squared errors: sum(y^2) - sum(y)^2 / n
+                error = (left[:, 2] - left[:, 1] ** 2 / left_sizes
+                         + right[:, 2] - right[:, 1] ** 2 / right_sizes)
+                size = total[0]
+            else:
+                left_sizes, right_sizes = left.sum(axis=1), right.sum(axis=1)
+                # n * gini = n - sum(counts^2) / n
+                error = (left_sizes - (left ** 2).sum(axis=1) / left_sizes
+                         + right_sizes - (right ** 2).sum(axis=1) / right_sizes)
+                size = total.sum()
+
+        costs = error / size
+        costs[(left_sizes < 0.5) | (right_sizes < 0.5)] = np.inf
+        return costs
+
+    def _histogram(self, bins: np.ndarray, stats: np.ndarray) -> np.ndarray:
+        """Sum target statistics per (feature, bin).
+
+        Features are accumulated one column at a time, so the working set
+        stays at a single column instead of index and weight copies of the
+        whole node matrix.
+
+        Args:
+            bins: Binned feature matrix of the node
+            stats: Target statistics of the node samples
+
+        Returns:
+            Histogram of shape (features, max_bins, stats)
         """
-        left, right = target[mask], target[~mask]
-        return (cost_func(left) * len(left)
-                + cost_func(right) * len(right)) / len(target)
+        num_features, num_stats = bins.shape[1], stats.shape[1]
+        hist = np.empty((num_features, self.max_bins, num_stats))
+        weights = [np.ascontiguousarray(stats[:, i]) for i in range(num_stats)]
+        for feat_idx in range(num_features):
+            column = bins[:, feat_idx]
+            for i in range(num_stats):
+                hist[feat_idx, :, i] = np.bincount(
+                    column, weights=weights[i], minlength=self.max_bins)
+        return hist
+
+    def _find_binned_split(
+        self,
+        hist: np.ndarray,
+        candidates: np.ndarray
+    ) -> Optional[tuple]:
+        """Find optimal split over bin boundaries of a node histogram.
+
+        Bins of categorical features are scanned in the order of their
+        target statistic, the missing value bin is tried on both sides.
+
+        Args:
+            hist: Node histogram from _histogram
+            candidates: Indices of features to consider
+
+        Returns:
+            Tuple of (feature_index, rule, missing_left) as in
+            _find_optimal_split, None if the node cannot be split
+        """
+        values, missing = hist[candidates, :-1], hist[candidates, -1]
+        categorical = [row for row, feat_idx in enumerate(candidates)
+                       if self._is_categorical(feat_idx)]
+        order = np.broadcast_to(np.arange(values.shape[1]), values.shape[:2])
+        if categorical:
+            order = order.copy()
+            for row in categorical:
+                order[row] = self._category_order(values[row])
+            values = np.take_along_axis(values, order[:, :, None], axis=1)
+
+        costs = self._scan_costs(values, missing, hist[candidates[0]].sum(axis=0))
+        best = int(np.argmin(costs))
+        if costs.flat[best] == np.inf:
+            return None
+        row, pos, missing_left = np.unravel_index(best, costs.shape)
+        feat_idx = int(candidates[row])
+        if self._is_categorical(feat_idx):
+            category_bins = self._bin_edges[feat_idx]
+            rule = np.flatnonzero(np.isin(category_bins, order[row, :pos + 1]))
+        else:
+            rule = self._bin_edges[feat_idx][pos]
+        return feat_idx, rule, bool(missing_left)
+
+    def _candidate_features(self, num_features: int) -> np.ndarray:
+        """Choose features considered for the next split.
+
+        Args:
+            num_features: Total number of features
+
+        Returns:
+            Sorted feature indices, all of them unless max_features is set
+        """
+        if self.max_features is None or self.max_features >= num_features:
+            return np.arange(num_features)
+        return np.sort(self.rng.choice(
+            num_features, self.max_features, replace=False))
 
     def _calculate_leaf_value(self, target: np.ndarray) -> Union[float, int]:
         """Calculate appropriate leaf value.
@@ -233,8 +1274,14 @@ class DecisionTree:
         Returns:
             Mean for regression, mode for classification
         """
-        return np.mean(target) if self.regression\
-            else pd.Series(target).mode()[0]
+        if self.regression:
+            return float(np.mean(target))
+        # the smallest of the most frequent values, as pandas mode()[0]
+        values, counts = np.unique(target, return_counts=True)
+        value = values[np.argmax(counts)]
+        if self._classes is not None:
+            value = self._classes[value]
+        return value.item() if isinstance(value, np.generic) else value
 
     def _calculate_node_error(self, target: np.ndarray) -> float:
         """Calculate node error for pruning.
@@ -247,20 +1294,7 @@ class DecisionTree:
         """
         method = self._calculate_mse if self.regression\
             else self._calculate_gini
-        return len(target) / self._num_samples * method(target)
-
-    def _calculate_pruning_gain(self, node: dict) -> float:
-        """Calculate potential gain from pruning node.
-
-        Args:
-            node: Node to evaluate for pruning
-
-        Returns:
-            Pruning gain value
-        """
-        return (
-            node['error'] - (node['left']['error'] + node['right']['error'])
-        ) / 1
+        return float(len(target) / self._num_samples * method(target))
 
     @staticmethod
     def _is_pure(target: np.ndarray) -> bool:
@@ -299,56 +1333,206 @@ class DecisionTree:
         """
         return np.mean((target - np.mean(target)) ** 2)
 
-    def _traverse_tree(
-            self,
-            features: np.ndarray,
-            node: dict
-    ) -> dict:
-        """
-        Recursively traverse tree to make prediction.
-
-        Args:
-            features: Feature vector for prediction
-            node: Current node in tree
-
-        Returns:
-            Predicted value (float for regression, int for classification)
-        """
-        if node['is_leaf']:
-            return node
-
-        feature_idx = self.feature_names.index(node['feature_name'])
-        if features[feature_idx] <= node['threshold']:
-            return self._traverse_tree(features, node['left'])
-        return self._traverse_tree(features, node['right'])
-
     def save_tree_to_file(self, file_path: str):
         """
-        Save the tree structure, feature names, target name, and paths in
-        leaves to a file.
+        Save the compiled tree, feature names and target name to a binary
+        model file (see save_model).
 
         Args:
-            file_path: Path to the file where the tree structure will be saved.
+            file_path: Path to the file where the tree will be saved.
         """
-        data_to_save = {
-            "feature_names": self.feature_names,
-            "target_name": self.target_name,
-            "tree_structure": self.tree
-        }
-        with open(file_path, 'w') as f:
-            f.write(str(data_to_save))
+        save_model(self, file_path)
 
-    def load_tree_from_file(self, file_path: str):
+    def load_tree_from_file(self, file_path: str, mmap: bool = True):
         """
-        Load the tree structure, feature names, target name, and paths in
-        leaves from a file.
+        Load the tree from a binary model file, or from a text file in the
+        legacy format (parsed as a literal, never executed).
 
         Args:
-            file_path: Path to the file from which the tree structure will be
-            loaded.
+            file_path: Path to the file from which the tree will be loaded.
+            mmap: Memory-map arrays of binary files instead of reading them
         """
+        with open(file_path, 'rb') as f:
+            is_binary = f.read(4) == b'PK\x03\x04'
+        if is_binary:
+            loaded = load_model(file_path, mmap)
+            self.regression = loaded.regression
+            self.feature_names = loaded.feature_names
+            self.target_name = loaded.target_name
+            self.categories = loaded.categories
+            self.ccp_alpha = loaded.ccp_alpha
+            self.float32_features = loaded.float32_features
+            self.tree = None
+            self._compiled, self._compiled_source = loaded.compiled, None
+            return
+
         with open(file_path, 'r') as f:
-            data = eval(f.read())
+            data = _literal_eval_numpy(f.read())
         self.feature_names = data.get("feature_names", [])
         self.target_name = data.get("target_name", "")
-        self.tree = data.get("tree_structure", {})
\ No newline at end of file
+        self.categories = data.get("categories")
+        # legacy files hold trees pruned when they were built
+        self.ccp_alpha = 0
+        self.float32_features = False
+        self.tree = data.get("tree_structure", {})
+
+
+NUMPY_SCALAR_TYPES = {
+    'float16', 'float32', 'float64', 'int8', 'int16', 'int32', 'int64',
+    'uint8', 'uint16', 'uint32', 'uint64', 'bool_', 'str_'
+}
+
+
+class _NumpyScalarUnwrapper(ast.NodeTransformer):
+    """Replace numpy scalar reprs such as np.float64(0.5) by their literal
+    argument, leaving any other call for literal_eval to reject."""
+
+    @staticmethod
+    def _is_numpy(node: ast.AST, names: set) -> bool:
+        return (isinstance(node, ast.Attribute) and node.attr in names
+                and isinstance(node.value, ast.Name)
+                and node.value.id in ('np', 'numpy'))
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        self.generic_visit(node)
+        if (self._is_numpy(node.func, NUMPY_SCALAR_TYPES)
+                and len(node.args) == 1 and not node.keywords):
+            return node.args[0]
+        return node
+
+    def visit_Attribute(self, node: ast.Attribute) -> ast.AST:
+        if self._is_numpy(node, {'True_', 'False_'}):
+            return ast.Constant(node.attr == 'True_')
+        return node
+
+
+def _literal_eval_numpy(text: str):
+    """
+    Parse a Python literal that may contain numpy scalar reprs.
+
+    Files saved by the legacy text format hold str() of the tree, which
+    under numpy 2 writes np.float64(...) and similar calls. Only those
+    calls are accepted; nothing is executed.
+
+    Args:
+        text: Literal source
+
+    Returns:
+        Parsed value
+
+    Raises:
+        ValueError: If text contains anything but literals and numpy
+        scalar reprs
+    """
+    expression = _NumpyScalarUnwrapper().visit(ast.parse(text, mode='eval'))
+    return ast.literal_eval(expression.body)
+
+
+def save_model(tree: DecisionTree, file):
+    """
+    Save tree in the binary model format.
+
+    The file is an uncompressed npz archive with the CompiledTree arrays and
+    a JSON 'meta' entry (format version, feature and target names, category
+    labels, ccp_alpha of the full grown tree, precision of training
+    features), so it
+    can be loaded without executing any code and memory-mapped.
+
+    Args:
+        tree: Built decision tree
+        file: Path or writable binary file object
+    """
+    compiled = tree.compiled
+    arrays = {name: getattr(compiled, name) for name in CompiledTree.ARRAY_FIELDS}
+    if arrays['value'].dtype == object:
+        arrays['value'] = arrays['value'].astype(str)
+    meta = {
+        'format': 'decision_tree',
+        'version': MODEL_FORMAT_VERSION,
+        'regression': tree.regression,
+        'ccp_alpha': tree.ccp_alpha,
+        'float32_features': tree.float32_features,
+        'feature_names': compiled.feature_names,
+        'target_name': tree.target_name,
+        'internal_values': compiled.internal_values,
+        'categories': compiled.categories
+    }
+    arrays['meta'] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+    np.savez(file, **arrays)
+
+
+def load_model(file, mmap: bool = True) -> DecisionTree:
+    """
+    Load tree saved by save_model.
+
+    Args:
+        file: Path or readable binary file object
+        mmap: Memory-map arrays instead of reading them (paths only)
+
+    Returns:
+        Decision tree with compiled form ready for prediction
+
+    Raises:
+        ValueError: If the file is not a model or its version is newer
+        than supported
+    """
+    arrays = None
+    if mmap and isinstance(file, (str, os.PathLike)):
+        arrays = _map_npz(file)
+    if arrays is None:
+        with np.load(file, allow_pickle=False) as archive:
+            arrays = {name: archive[name] for name in archive.files}
+
+    meta = json.loads(arrays.pop('meta').tobytes().decode())
+    if meta.get('format') != 'decision_tree':
+        raise ValueError("Not a decision tree model file")
+    if meta.get('version', 0) > MODEL_FORMAT_VERSION:
+        raise ValueError(f"Unsupported model version {meta['version']}")
+
+    # older versions stored trees already pruned at their alpha
+    tree = DecisionTree(regression=meta['regression'], ccp_alpha=meta.get('ccp_alpha', 0))
+    tree.feature_names = meta['feature_names']
+    tree.target_name = meta['target_name']
+    tree.categories = meta.get('categories')
+    # files written before the marker may hold float64 thresholds
+    tree.float32_features = meta.get('float32_features', False)
+    tree._compiled = CompiledTree.from_arrays(
+        arrays, meta['feature_names'], meta['internal_values'], tree.categories)
+    return tree
+
+
+def _map_npz(path) -> Optional[dict]:
+    """
+    Memory-map members of an uncompressed npz archive.
+
+    Args:
+        path: Path to the archive
+
+    Returns:
+        Mapping of member names to read-only arrays, None if the archive
+        is compressed
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                return None
+            # local header: 30 bytes, then file name and extra field
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            name = info.filename[:-len('.npy')]
+            if dtype.hasobject:
+                return None
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(),
+                                         shape=shape, order='F' if fortran_order else 'C')
+    return arrays
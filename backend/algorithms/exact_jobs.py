@@ -0,0 +1,192 @@
+"""
+Фоновые задачи точного решения TSP.
+
+Каждая задача считается в отдельном процессе (не больше max_workers
+одновременно), поэтому не блокирует event loop, не роняет сервер по памяти
+и может быть отменена. Прогресс передаётся через разделяемую переменную.
+"""
+
+from typing import List, Tuple, Optional, Literal, Callable
+import logging
+import multiprocessing
+import threading
+import uuid
+from pydantic import BaseModel, Field
+
+from backend.algorithms.genetic_algorithm import get_exact_solution, held_karp_memory
+from backend.algorithms.branch_and_bound import branch_and_bound
+from backend.algorithms.sessions import MemorySessionStore
+
+logger = logging.getLogger(__name__)
+
+HELD_KARP_MAX_POINTS = 20
+MAX_EXACT_MEMORY = 512 * 2 ** 20
+MAX_BRANCH_AND_BOUND_POINTS = 500
+
+
+class ExactJobDto(BaseModel):
+    points: List[Tuple[float, float]]
+    method: Literal["auto", "held_karp", "branch_and_bound"] = "auto"
+    time_limit: float = Field(10, gt=0, le=600)
+
+
+def resolve_method(points_count: int, method: str) -> str:
+    """
+    Выбирает метод и проверяет, что задача поместится в память.
+
+    Raises:
+        ValueError: если задача слишком велика для выбранного метода
+    """
+    if method == "auto":
+        method = "held_karp" if points_count <= HELD_KARP_MAX_POINTS else "branch_and_bound"
+
+    if method == "held_karp" and held_karp_memory(points_count) > MAX_EXACT_MEMORY:
+        raise ValueError(f"Хелд-Карп для {points_count} точек требует "
+                         f"~{held_karp_memory(points_count) // 2 ** 20} МБ, "
+                         f"лимит {MAX_EXACT_MEMORY // 2 ** 20} МБ")
+    if method == "branch_and_bound" and points_count > MAX_BRANCH_AND_BOUND_POINTS:
+        raise ValueError(f"Не более {MAX_BRANCH_AND_BOUND_POINTS} точек для метода ветвей и границ")
+    return method
+
+
+def _solve(method: str, points, time_limit: float, initial_route, progress, connection):
+    # выполняется в дочернем процессе
+    def report(value: float):
+        progress.value = min(1.0, value)
+
+    try:
+        if method == "held_karp":
+            result = get_exact_solution(points, report)
+        else:
+            result = branch_and_bound(points, time_limit, initial_route, report)
+        connection.send(("done", result))
+    except Exception as e:
+        connection.send(("failed", str(e)))
+    finally:
+        connection.close()
+
+
+class ExactJob:
+    """Состояние задачи: queued -> running -> done / failed / cancelled."""
+
+    def __init__(self, method: str, points, time_limit: float, initial_route: Optional[List[int]] = None):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.points = points
+        self.time_limit = time_limit
+        self.initial_route = initial_route
+
+        self.status = "queued"
+        self.result = None
+        self.error: Optional[str] = None
+        self.finished = threading.Event()
+
+        self._progress = multiprocessing.Value("d", 0.0)
+        self._process: Optional[multiprocessing.Process] = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    @property
+    def progress(self) -> float:
+        return 1.0 if self.status == "done" else self._progress.value
+
+    def to_json(self):
+        return {
+            "job_id": self.id,
+            "method": self.method,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error
+        }
+
+    def run(self, slots: threading.Semaphore, on_done: Optional[Callable[["ExactJob"], None]] = None):
+        # finished выставляется в любом случае, иначе ожидающие запросы зависнут
+        try:
+            self._execute(slots)
+            if self.status == "done" and on_done is not None:
+                try:
+                    on_done(self)
+                except Exception:
+                    logger.exception("Обработчик завершения задачи %s упал", self.id)
+        except Exception as e:
+            with self._lock:
+                if self.active:
+                    self.status, self.error = "failed", str(e)
+        finally:
+            self.finished.set()
+
+    def _execute(self, slots: threading.Semaphore):
+        with slots:
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            with self._lock:
+                if self.status == "cancelled":
+                    return
+                self._process = multiprocessing.Process(
+                    target=_solve,
+                    args=(self.method, self.points, self.time_limit, self.initial_route, self._progress, sender),
+                    daemon=True)
+                self._process.start()
+                self.status = "running"
+            sender.close()
+
+            try:
+                status, payload = receiver.recv()
+            except EOFError:
+                # процесс завершился без ответа: отменён или убит (например, по памяти)
+                status, payload = "failed", "Процесс решения завершился аварийно"
+            self._process.join()
+
+            with self._lock:
+                if self.status == "cancelled":
+                    return
+                self.status = status
+                if status == "done":
+                    self.result = payload
+                else:
+                    self.error = payload
+
+    def cancel(self):
+        with self._lock:
+            if self.status in ("done", "failed", "cancelled"):
+                return
+            self.status = "cancelled"
+            if self._process is not None and self._process.is_alive():
+                self._process.terminate()
+        self.finished.set()
+
+
+class ExactJobManager:
+    def __init__(self, max_workers: int = 2, ttl: float = 3600, max_jobs: int = 256,
+                 on_done: Optional[Callable[[ExactJob], None]] = None):
+        self._slots = threading.Semaphore(max_workers)
+        # незавершённые задачи не вытесняются, иначе их нельзя будет отменить
+        self._jobs = MemorySessionStore(ttl=ttl, max_size=max_jobs, pinned=lambda job: job.active)
+        self.max_jobs = max_jobs
+        # вызывается в потоке задачи после успешного решения (например, для кэширования)
+        self.on_done = on_done
+
+    def submit(self, points, method: str = "auto", time_limit: float = 10,
+               initial_route: Optional[List[int]] = None) -> ExactJob:
+        """
+        Raises:
+            ValueError: если задача слишком велика или незавершённых задач слишком много
+        """
+        if self._jobs.count(lambda job: job.active) >= self.max_jobs:
+            raise ValueError(f"Не более {self.max_jobs} незавершённых задач одновременно")
+        job = ExactJob(resolve_method(len(points), method), points, time_limit, initial_route)
+        self._jobs.put(job.id, job)
+        threading.Thread(target=job.run, args=(self._slots, self.on_done), daemon=True).start()
+        return job
+
+    def get(self, job_id: str) -> Optional[ExactJob]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[ExactJob]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
@@ -1,19 +1,80 @@
-from typing import Tuple, List
+from typing import Tuple, List, Optional, Literal, Callable
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
 import numpy as np
-from numpy import random
-import random
-from pydantic import BaseModel
-from math import floor
+from pydantic import BaseModel, Field
+from math import floor, inf, comb
+import os
+import time
 
+from backend.algorithms.local_search import neighbor_lists, improve_route, order_crossover
+
+
+def distance_matrix(points: List[Tuple[float, float]]) -> np.ndarray:
+    coords = np.asarray(points, dtype=float).reshape(-1, 2)
+    diff = coords[:, None, :] - coords[None, :, :]
+    return np.sqrt((diff ** 2).sum(axis=-1))
+
+
+def tour_lengths(distances: np.ndarray, routes: np.ndarray) -> np.ndarray:
+    # длины всех маршрутов одной индексацией по матрице расстояний
+    return distances[routes, np.roll(routes, -1, axis=1)].sum(axis=1)
+
+
+def check_routes(routes, n: int) -> np.ndarray:
+    """
+    Проверяет, что каждая строка - перестановка range(n).
+
+    Raises:
+        ValueError: если маршрут пропускает или повторяет города
+    """
+    try:
+        routes = np.asarray(routes, dtype=np.intp)
+    except (ValueError, TypeError):
+        raise ValueError("Маршруты должны быть списками индексов одной длины")
+    if routes.ndim != 2 or routes.shape[1] != n:
+        raise ValueError(f"Маршрут должен содержать {n} индексов")
+    if not (np.sort(routes, axis=1) == np.arange(n)).all():
+        raise ValueError(f"Маршрут должен быть перестановкой чисел от 0 до {n - 1}")
+    return routes
 
-def dist(point1: Tuple[float, float], point2: Tuple[float, float]):
-    return ((point1[0] - point2[0]) ** 2 + (point1[1] - point2[1]) ** 2) ** 0.5
 
 class GeneticsDto(BaseModel):
     points: List[Tuple[float, float]]
     prev_generation: List[List[int]]
 
 
+class GeneticRunDto(BaseModel):
+    points: List[Tuple[float, float]]
+    generations: int = Field(200, ge=1, le=100000)
+    patience: Optional[int] = Field(None, ge=1)
+    # секунды, ограничивает время, на которое запрос занимает воркер
+    time_limit: float = Field(30, gt=0, le=120)
+    snapshot_every: int = Field(10, ge=1)
+    stream: bool = False
+    memetic: bool = False
+
+
+class GeneticSessionDto(BaseModel):
+    points: List[Tuple[float, float]]
+    seed: Optional[int] = None
+    memetic: bool = False
+
+
+class GeneticIslandsDto(BaseModel):
+    points: List[Tuple[float, float]]
+    islands: int = Field(4, ge=1, le=64)
+    generations: int = Field(200, ge=1, le=100000)
+    migration_interval: int = Field(10, ge=1, le=100000)
+    # не больше размера подпопуляции GeneticAlgorithm.generation_size
+    migration_size: int = Field(2, ge=1, le=200)
+    topology: Literal["ring", "full", "random"] = "ring"
+    seed: Optional[int] = None
+    memetic: bool = False
+    # секунды, проверяется между эпохами миграции
+    time_limit: float = Field(30, gt=0, le=120)
+
+
 class GeneticAlgorithm:
     mutation_rate = 0.02
     generation_size = 200
@@ -21,108 +82,357 @@ class GeneticAlgorithm:
     tournament_size = 10
     elite_part = 0.2
 
-    generation = []
-    points = []
+    # generation - (P, n) матрица маршрутов, lengths - закэшированные длины маршрутов
+    generation: np.ndarray
+    lengths: np.ndarray
+    distances: np.ndarray
 
-    def __init__(self, points, generation):
+    def __init__(self, points, generation, rng: Optional[np.random.Generator] = None,
+                 distances: Optional[np.ndarray] = None):
         self.points = points
-        self.generation = generation
+        self.distances = distances if distances is not None else distance_matrix(points)
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        if len(generation) == 0:
+            self.generation = np.argsort(self.rng.random((self.generation_size, len(points))), axis=1)
+        else:
+            self.generation = check_routes(generation, len(points))
+
+        self.lengths = self.evaluate(self.generation)
 
-        if len(self.generation) == 0:
-            path = [i for i in range(len(points))]
+    def seed(self, routes: List[List[int]]):
+        # известные маршруты (например, из кэша) заменяют первые особи популяции
+        routes = check_routes(routes, len(self.points))[:len(self.generation)]
+        self.generation[:len(routes)] = routes
+        self.lengths = self.evaluate(self.generation)
+
+    def evaluate(self, generation: np.ndarray) -> np.ndarray:
+        return tour_lengths(self.distances, generation)
 
-            for _ in range(self.generation_size):
-                random.shuffle(path)
-                self.generation.append(path)
-    
     def fitness(self, chromosome):
-        suma = 0
-        
-        for i in range(len(chromosome)):
-            suma += dist(self.points[chromosome[i]], self.points[chromosome[(i + 1) % len(chromosome)]])
-        
-        return suma
+        chromosome = np.asarray(chromosome, dtype=np.intp)
+        return float(self.distances[chromosome, np.roll(chromosome, -1)].sum())
+
+    def select_parents(self, count: int) -> np.ndarray:
+        # count турниров без повторов внутри турнира, победитель - минимальная закэшированная длина
+        tournament_size = min(self.tournament_size, len(self.generation))
+        selected = np.argsort(self.rng.random((count, len(self.generation))), axis=1)[:, :tournament_size]
+        winners = np.argmin(self.lengths[selected], axis=1)
+        return selected[np.arange(count), winners]
 
     def select_parent(self):
-        selected = random.sample(self.generation, self.tournament_size)
-        return min(selected, key=lambda route: self.fitness(route))
-    
+        return self.generation[self.select_parents(1)[0]]
+
     def crossover(self, parent1, parent2):
-        idx = random.randint(0, len(parent1) - 1)
-        child = parent1[:idx+1]
-        child_set = set(child)
-
-        for city in parent2:
-            if not city in child_set:
-                child.append(city)
-                child_set.add(city)
-        
-        return child
+        idx = self.rng.integers(0, len(parent1))
+        head = parent1[:idx+1]
+        return np.concatenate((head, parent2[~np.isin(parent2, head)]))
 
     def mutate(self, child):
-        idx1 = random.randint(0, len(self.points) - 1)
-        idx2 = random.randint(0, len(self.points) - 1)
+        idx1, idx2 = self.rng.integers(0, len(self.points), 2)
 
         child[idx1], child[idx2] = child[idx2], child[idx1]
         return child
 
-    def run(self):
-        # for _ in range(self.iteration_count):
-        next_generation = sorted(self.generation, key=lambda route: self.fitness(route))[:floor(self.elite_part * len(self.generation))]
+    def step(self):
+        elite_count = floor(self.elite_part * len(self.generation))
+        elite = np.argsort(self.lengths, kind='stable')[:elite_count]
 
-        while len(next_generation) < self.generation_size:
-            parent1 = self.select_parent()
-            parent2 = self.select_parent()
+        pairs_count = (self.generation_size - elite_count + 1) // 2
+        parents = self.select_parents(2 * pairs_count).reshape(pairs_count, 2)
+
+        children = []
+        for idx1, idx2 in parents:
+            parent1, parent2 = self.generation[idx1], self.generation[idx2]
 
             child1 = self.crossover(parent1, parent2)
             child2 = self.crossover(parent2, parent1)
-            
 
-            if random.random() < self.mutation_rate:
+            if self.rng.random() < self.mutation_rate:
                 child1 = self.mutate(child1)
-            if random.random() < self.mutation_rate:
+            if self.rng.random() < self.mutation_rate:
                 child2 = self.mutate(child2)
-            
-            next_generation.append(child1)
-            next_generation.append(child2)
-        
+
+            children.append(child1)
+            children.append(child2)
+
+        next_generation = self.generation[elite]
+        if children:
+            next_generation = np.vstack((next_generation, np.array(children, dtype=np.intp)))
         self.generation = next_generation
-        
-        answer = min(self.generation, key=lambda route: self.fitness(route))
-        return [[self.points[i] for i in answer], self.fitness(answer), self.generation]
-
-
-def get_exact_solution(points: List[Tuple[float, float]]):
-    INFINITY = 2e9
-
-    dp = [[INFINITY for _ in range(len(points))] for _ in range(2**len(points))]
-    dp[1][0] = 0
-
-    for mask in range(2, 2 ** len(points)):
-        for cur_city in range(0, len(points)):
-            if not (mask & (2**cur_city)):
-                continue
-            for prev_city in range(0, len(points)):
-                if cur_city == prev_city or not (mask & (2**prev_city)):
-                    continue
-                dp[mask][cur_city] = min(dp[mask][cur_city], dp[mask ^ (2**cur_city)][prev_city] + dist(points[cur_city], points[prev_city]))
-    
-    min_dist = INFINITY
-    last_city = -1
-    for i in range(0, len(points)):
-        cur_dist = dp[2**len(points) - 1][i] + dist(points[0], points[i])
-        if cur_dist < min_dist:
-            min_dist = cur_dist
-            last_city = i
-    
-    path = [last_city]
-    cur_mask = 2**len(points) - 1
-    while last_city != 0:
-        for i in range(0, len(points)):
-            if dp[cur_mask ^ (2**last_city)][i] + dist(points[last_city], points[i]) == dp[cur_mask][last_city]:
-                cur_mask = cur_mask ^ (2**last_city)
-                last_city = i
-                path.append(last_city)
+        self.lengths = self.evaluate(self.generation)
+
+    def best_route(self):
+        answer = int(np.argmin(self.lengths))
+        return self.generation[answer], float(self.lengths[answer])
+
+    def best(self):
+        route, length = self.best_route()
+        return [[self.points[i] for i in route], length]
+
+    def run(self):
+        # один шаг эволюции, популяция возвращается клиенту
+        self.step()
+        return self.best() + [self.generation.tolist()]
+
+    def evolve(self, generations: int, patience: Optional[int] = None,
+               time_limit: Optional[float] = None, snapshot_every: int = 10):
+        """
+        Эволюция на сервере: до generations поколений, пока лучший маршрут
+        улучшается хотя бы раз за patience поколений и не истёк time_limit (секунды).
+        Каждые snapshot_every поколений (и в конце) отдаёт лучший маршрут.
+        """
+        started = time.monotonic()
+        best_length = float(self.lengths.min()) if len(self.lengths) else inf
+        stale = 0
+
+        for generation in range(1, generations + 1):
+            self.step()
+
+            current_length = float(self.lengths.min())
+            if current_length < best_length:
+                best_length = current_length
+                stale = 0
+            else:
+                stale += 1
+
+            done = (generation == generations
+                    or (patience is not None and stale >= patience)
+                    or (time_limit is not None and time.monotonic() - started >= time_limit))
+
+            if done or generation % snapshot_every == 0:
+                route, length = self.best()
+                yield {"generation": generation, "route": route, "length": length, "done": done}
+            if done:
+                return
+
+
+class GeneticSession:
+    """Популяция, живущая на сервере между запросами. Поколения считаются под блокировкой."""
+
+    def __init__(self, genetic: GeneticAlgorithm):
+        self.genetic = genetic
+        self.lock = Lock()
+
+    def advance(self, generations: int = 1):
+        # лучший маршрут в индексах и точках: (индексы, [точки, длина])
+        with self.lock:
+            for _ in range(generations):
+                self.genetic.step()
+            route, length = self.genetic.best_route()
+            return route.copy(), self.genetic.best()
+
+
+class MemeticAlgorithm(GeneticAlgorithm):
+    """
+    ГА с локальным поиском: OX-скрещивание, дети (или элита) доводятся
+    2-opt и Or-opt по спискам ближайших соседей.
+    """
+    generation_size = 40
+    neighbors_count = 8
+    local_search_iterations = 1000
+    # "children" - улучшать всех новых потомков, "elites" - только элиту поколения
+    improve = "children"
+
+    def __init__(self, points, generation, rng: Optional[np.random.Generator] = None,
+                 distances: Optional[np.ndarray] = None):
+        super().__init__(points, generation, rng, distances)
+        self.neighbors = neighbor_lists(points, self.neighbors_count)
+
+        if len(generation) == 0:
+            self.improve_routes(range(len(self.generation)))
+
+    def improve_routes(self, indices):
+        for idx in indices:
+            self.generation[idx] = improve_route(self.generation[idx], self.distances, self.neighbors,
+                                                 self.local_search_iterations)
+        self.lengths = self.evaluate(self.generation)
+
+    def crossover(self, parent1, parent2):
+        return order_crossover(parent1, parent2, self.rng)
+
+    def step(self):
+        elite_count = floor(self.elite_part * len(self.generation))
+        super().step()
+
+        if self.improve == "elites":
+            self.improve_routes(np.argsort(self.lengths, kind='stable')[:elite_count])
+        else:
+            self.improve_routes(range(elite_count, len(self.generation)))
+
+
+# матрица расстояний рабочего процесса острова, передаётся один раз при старте пула
+MAX_ISLAND_PROCESSES = 4
+
+_island_points = None
+_island_distances = None
+_island_algorithm = GeneticAlgorithm
+
+
+def _init_island_worker(points, algorithm):
+    global _island_points, _island_distances, _island_algorithm
+    _island_points = points
+    _island_distances = distance_matrix(points)
+    _island_algorithm = algorithm
+
+
+def _evolve_island(generation: np.ndarray, rng: np.random.Generator, generations: int):
+    genetic = _island_algorithm(_island_points, generation, rng, _island_distances)
+    for _ in range(generations):
+        genetic.step()
+    return genetic.generation, genetic.rng
+
+
+def _migrate(populations: List[np.ndarray], distances: np.ndarray, migration_size: int,
+             topology: str, rng: np.random.Generator) -> List[np.ndarray]:
+    islands = len(populations)
+    lengths = [tour_lengths(distances, population) for population in populations]
+    elites = [population[np.argsort(island_lengths, kind='stable')[:migration_size]]
+              for population, island_lengths in zip(populations, lengths)]
+
+    migrated = []
+    for i, (population, island_lengths) in enumerate(zip(populations, lengths)):
+        if topology == "ring":
+            sources = [(i - 1) % islands]
+        elif topology == "full":
+            sources = [j for j in range(islands) if j != i]
+        else:
+            sources = [int(rng.choice([j for j in range(islands) if j != i]))]
+
+        migrants = np.vstack([elites[j] for j in sources])[:len(population)]
+        # мигранты вытесняют худшие маршруты острова
+        worst = np.argsort(island_lengths, kind='stable')[len(population) - len(migrants):]
+        population = population.copy()
+        population[worst] = migrants
+        migrated.append(population)
+
+    return migrated
+
+
+def run_islands(points: List[Tuple[float, float]], islands: int = 4, generations: int = 200,
+                migration_interval: int = 10, migration_size: int = 2, topology: str = "ring",
+                seed: Optional[int] = None, processes: Optional[int] = None, memetic: bool = False,
+                initial_routes: Optional[List[List[int]]] = None, time_limit: Optional[float] = None):
+    """
+    Островная модель: islands подпопуляций эволюционируют в пуле процессов,
+    каждые migration_interval поколений лучшие migration_size маршрутов
+    переселяются к соседям по topology ("ring", "full" или "random").
+    При одинаковом seed результат воспроизводится независимо от числа процессов.
+    initial_routes, если заданы, добавляются в каждую подпопуляцию.
+    Процессов не больше MAX_ISLAND_PROCESSES; если истёк time_limit (секунды),
+    эволюция останавливается после текущей эпохи.
+    """
+    started = time.monotonic()
+    algorithm = MemeticAlgorithm if memetic else GeneticAlgorithm
+    distances = distance_matrix(points)
+    seeds = np.random.SeedSequence(seed).spawn(islands + 1)
+    migration_rng = np.random.default_rng(seeds[0])
+    rngs = [np.random.default_rng(island_seed) for island_seed in seeds[1:]]
+    populations = []
+    for rng in rngs:
+        genetic = algorithm(points, [], rng, distances)
+        if initial_routes:
+            genetic.seed(initial_routes)
+        populations.append(genetic.generation)
+
+    processes = min(processes or os.cpu_count() or 1, MAX_ISLAND_PROCESSES, islands)
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_island_worker,
+                             initargs=(points, algorithm)) as pool:
+        done = 0
+        while done < generations:
+            if time_limit is not None and done and time.monotonic() - started >= time_limit:
                 break
-    
-    return ([points[i] for i in path], min_dist)
+            epoch = min(migration_interval, generations - done)
+            results = list(pool.map(_evolve_island, populations, rngs, [epoch] * islands))
+            populations = [population for population, _ in results]
+            rngs = [rng for _, rng in results]
+            done += epoch
+
+            if done < generations and islands > 1:
+                populations = _migrate(populations, distances, migration_size, topology, migration_rng)
+
+    lengths = [tour_lengths(distances, population) for population in populations]
+    best_island = int(np.argmin([island_lengths.min() for island_lengths in lengths]))
+    answer = populations[best_island][int(np.argmin(lengths[best_island]))]
+
+    return {
+        "route": [points[i] for i in answer],
+        "route_indices": answer.tolist(),
+        "length": float(lengths[best_island].min()),
+        "island_lengths": [float(island_lengths.min()) for island_lengths in lengths],
+        "generation": done
+    }
+
+
+def held_karp_memory(points_count: int) -> int:
+    # оценка пиковой памяти get_exact_solution в байтах: dp (float32), parent (int8),
+    # маски и popcount, плюс временные массивы самого большого слоя
+    if points_count <= 1:
+        return 0
+    cities = points_count - 1
+    masks_count = 1 << cities
+    largest_layer = comb(cities, cities // 2)
+    return masks_count * (cities * 5 + 9) + largest_layer * cities * 16
+
+
+def get_exact_solution(points: List[Tuple[float, float]],
+                       progress: Optional[Callable[[float], None]] = None):
+    """
+    Held-Karp на масках: город 0 - старт, бит b маски - город b + 1.
+    Слои масок с одинаковым числом бит считаются векторно, для каждой
+    пары (маска, последний город) хранится предыдущий город.
+    progress, если задан, получает долю обработанных масок.
+    Возвращает (маршрут, длина, сведения) в том же виде, что branch_and_bound;
+    решение всегда оптимально.
+    """
+    n = len(points)
+    if n <= 1:
+        return ([point for point in points], 0.0, _optimal_info(0.0))
+
+    distances = distance_matrix(points)
+    cities = n - 1
+    masks_count = 1 << cities
+
+    dp = np.full((masks_count, cities), np.inf, dtype=np.float32)
+    parent = np.full((masks_count, cities), -1, dtype=np.int8)
+    inner = distances[1:, 1:].astype(np.float32)
+
+    singles = 1 << np.arange(cities)
+    dp[singles, np.arange(cities)] = distances[0, 1:]
+
+    masks = np.arange(masks_count)
+    popcount = np.zeros(masks_count, dtype=np.int8)
+    for bit in range(cities):
+        popcount += (masks >> bit) & 1
+
+    processed = cities + 1
+    for size in range(2, cities + 1):
+        layer = masks[popcount == size]
+        processed += len(layer)
+        for last in range(cities):
+            current = layer[(layer >> last) & 1 == 1]
+            candidates = dp[current ^ (1 << last)] + inner[:, last]
+            best = np.argmin(candidates, axis=1)
+            parent[current, last] = best
+            dp[current, last] = candidates[np.arange(len(current)), best]
+        if progress is not None:
+            progress(processed / masks_count)
+
+    full = masks_count - 1
+    last = int(np.argmin(dp[full] + distances[1:, 0]))
+
+    path = []
+    mask = full
+    while last != -1:
+        path.append(last + 1)
+        mask, last = mask ^ (1 << last), int(parent[mask, last])
+    path.append(0)
+    path.reverse()
+
+    route = np.array(path)
+    length = float(tour_lengths(distances, route[None, :])[0])
+    return ([points[i] for i in path], length, _optimal_info(length))
+
+
+def _optimal_info(length: float) -> dict:
+    return {"lower_bound": length, "gap": 0.0, "optimal": True, "nodes": 0}
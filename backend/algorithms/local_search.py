@@ -0,0 +1,120 @@
+from typing import List, Tuple
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+def neighbor_lists(points: List[Tuple[float, float]], k: int = 8) -> np.ndarray:
+    # k ближайших соседей каждой точки (без неё самой), матрица (n, k)
+    coords = np.asarray(points, dtype=float).reshape(-1, 2)
+    k = min(k, len(coords) - 1)
+    if k <= 0:
+        return np.empty((len(coords), 0), dtype=np.intp)
+
+    _, neighbors = cKDTree(coords).query(coords, k + 1)
+    return neighbors[:, 1:].astype(np.intp)
+
+
+def two_opt_step(route: np.ndarray, distances: np.ndarray, neighbors: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Лучший 2-opt ход среди рёбер (a, c), где c - сосед a.
+    Все кандидаты оцениваются разом, возвращает (новый маршрут, выигрыш).
+    """
+    n = len(route)
+    position = np.empty(n, dtype=np.intp)
+    position[route] = np.arange(n)
+
+    a = route[:, None]
+    b = route[(np.arange(n) + 1) % n][:, None]
+    c = neighbors[route]
+    d = route[(position[c] + 1) % n]
+
+    delta = distances[a, b] + distances[c, d] - distances[a, c] - distances[b, d]
+    best = np.unravel_index(np.argmax(delta), delta.shape)
+    if delta[best] <= 1e-9:
+        return route, 0.0
+
+    i, j = best[0], position[c[best]]
+    lo, hi = min(i, j), max(i, j)
+    route = route.copy()
+    route[lo + 1:hi + 1] = route[lo + 1:hi + 1][::-1]
+    return route, float(delta[best])
+
+
+def or_opt_step(route: np.ndarray, distances: np.ndarray, neighbors: np.ndarray,
+                segment_lengths=(1, 2, 3)) -> Tuple[np.ndarray, float]:
+    """
+    Лучший Or-opt ход: отрезок из 1-3 городов переносится (возможно, развёрнутым)
+    к соседу одного из своих концов.
+    """
+    n = len(route)
+    position = np.empty(n, dtype=np.intp)
+    position[route] = np.arange(n)
+    starts = np.arange(n)
+
+    best_gain, best_move = 1e-9, None
+    for length in segment_lengths:
+        if length >= n - 2:
+            break
+
+        first = route[starts]
+        last = route[(starts + length - 1) % n]
+        prev = route[(starts - 1) % n]
+        after = route[(starts + length) % n]
+        removed = distances[prev, first] + distances[last, after] - distances[prev, after]
+
+        # куда вставлять: между c и следующим за ним e
+        c = np.concatenate((neighbors[first], neighbors[last]), axis=1)
+        offset = (position[c] - starts[:, None]) % n
+        e = route[(position[c] + 1) % n]
+        valid = (offset >= length) & (offset != n - 1)
+
+        forward = distances[c, first[:, None]] + distances[last[:, None], e] - distances[c, e]
+        backward = distances[c, last[:, None]] + distances[first[:, None], e] - distances[c, e]
+        gain = removed[:, None] - np.minimum(forward, backward)
+        gain[~valid] = -np.inf
+
+        move = np.unravel_index(np.argmax(gain), gain.shape)
+        if gain[move] > best_gain:
+            best_gain = float(gain[move])
+            best_move = (length, move[0], offset[move] - length, backward[move] < forward[move])
+
+    if best_move is None:
+        return route, 0.0
+
+    length, start, insert_after, reverse = best_move
+    rolled = np.roll(route, -start)
+    segment, rest = rolled[:length], rolled[length:]
+    if reverse:
+        segment = segment[::-1]
+    return np.concatenate((rest[:insert_after + 1], segment, rest[insert_after + 1:])), best_gain
+
+
+def improve_route(route: np.ndarray, distances: np.ndarray, neighbors: np.ndarray,
+                  max_iterations: int = 1000) -> np.ndarray:
+    # 2-opt до локального минимума, затем Or-opt; повторяем, пока хоть один ход улучшает
+    if len(route) < 4:
+        return route
+
+    for _ in range(max_iterations):
+        route, gain = two_opt_step(route, distances, neighbors)
+        if gain > 0:
+            continue
+        route, gain = or_opt_step(route, distances, neighbors)
+        if gain == 0:
+            break
+    return route
+
+
+def order_crossover(parent1: np.ndarray, parent2: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    # OX: отрезок parent1 остаётся на месте, остальные города идут в порядке parent2 после отрезка
+    n = len(parent1)
+    i, j = np.sort(rng.choice(n + 1, 2, replace=False))
+    segment = parent1[i:j]
+
+    rest = np.roll(parent2, -j)
+    rest = rest[~np.isin(rest, segment)]
+
+    child = np.empty(n, dtype=parent1.dtype)
+    child[i:j] = segment
+    child[np.r_[j:n, 0:i]] = rest
+    return child
@@ -0,0 +1,86 @@
+"""
+Реестр моделей деревьев решений.
+
+Модели сохраняются на диск в бинарном формате (save_model) под случайным
+идентификатором и загружаются с отображением файла в память. Недавно
+использованные модели держатся в памяти, чтобы не открывать файл на каждый
+запрос. На диске хранится не больше max_models моделей, модели, к которым не
+обращались дольше max_age секунд, удаляются.
+"""
+
+from typing import Optional
+import os
+import re
+import time
+import uuid
+
+from backend.algorithms.decision_tree import DecisionTree, save_model, load_model
+from backend.algorithms.sessions import MemorySessionStore
+
+MODEL_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+class ModelRegistry:
+    def __init__(self, directory: str, cache_size: int = 16, ttl: float = 3600,
+                 max_models: int = 256, max_age: float = 7 * 24 * 3600):
+        self.directory = directory
+        self.max_models = max_models
+        self.max_age = max_age
+        self._cache = MemorySessionStore(ttl=ttl, max_size=cache_size)
+
+    def _path(self, model_id: str) -> Optional[str]:
+        # идентификатор становится именем файла, поэтому принимаем только hex
+        if not MODEL_ID_PATTERN.fullmatch(model_id):
+            return None
+        return os.path.join(self.directory, model_id + ".npz")
+
+    def save(self, tree: DecisionTree) -> str:
+        model_id = uuid.uuid4().hex
+        path = self._path(model_id)
+        os.makedirs(self.directory, exist_ok=True)
+
+        # запись через временный файл: читатель не увидит модель наполовину
+        with open(path + ".tmp", "wb") as f:
+            save_model(tree, f)
+        os.replace(path + ".tmp", path)
+        self._cache.put(model_id, tree)
+        self.evict()
+        return model_id
+
+    def load(self, model_id: str) -> Optional[DecisionTree]:
+        tree = self._cache.get(model_id)
+        if tree is not None:
+            return tree
+
+        path = self._path(model_id)
+        if path is None or not os.path.exists(path):
+            return None
+        tree = load_model(path)
+        # время изменения файла - время последнего обращения к модели
+        os.utime(path)
+        self._cache.put(model_id, tree)
+        return tree
+
+    def evict(self):
+        # удаляем устаревшие модели и самые давние сверх max_models
+        if not os.path.isdir(self.directory):
+            return
+        models = []
+        for entry in os.scandir(self.directory):
+            model_id, extension = os.path.splitext(entry.name)
+            if extension == ".npz" and MODEL_ID_PATTERN.fullmatch(model_id):
+                models.append((entry.stat().st_mtime, model_id))
+        models.sort(reverse=True)
+
+        now = time.time()
+        for i, (touched, model_id) in enumerate(models):
+            if i >= self.max_models or now - touched > self.max_age:
+                self.delete(model_id)
+
+    def delete(self, model_id: str) -> bool:
+        path = self._path(model_id)
+        self._cache.delete(model_id)
+        if path is None or not os.path.exists(path):
+            return False
+        os.remove(path)
+        return True
@@ -0,0 +1,218 @@
+"""
+Random forest on top of the CART core of DecisionTree.
+
+Every tree is grown on a bootstrap sample with a random subset of features
+considered at each split. Trees are trained in a process pool; the training
+arrays are placed in shared memory once instead of being pickled to every
+task. Prediction routes all rows through every compiled tree and combines
+the results with vectorized voting (classification) or averaging
+(regression).
+"""
+
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+from backend.algorithms.decision_tree import DecisionTree, CompiledTree, \
+    read_csv_columns, bin_features, feature_matrix
+
+_forest_arrays: dict = {}
+_forest_memory: list = []
+_forest_params: dict = {}
+
+
+def _share(array: np.ndarray) -> tuple:
+    """Copy array into a new shared memory block.
+
+    Returns:
+        Tuple of (shared memory block, (name, shape, dtype) to attach it)
+    """
+    memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, buffer=memory.buf)[...] = array
+    return memory, (memory.name, array.shape, array.dtype.str)
+
+
+def _init_forest_worker(arrays: dict, params: dict):
+    global _forest_params
+    for key, (name, shape, dtype) in arrays.items():
+        memory = shared_memory.SharedMemory(name=name)
+        _forest_memory.append(memory)
+        _forest_arrays[key] = np.ndarray(shape, dtype, buffer=memory.buf)
+    _forest_params = params
+
+
+def _grow_forest_tree(seed: int) -> CompiledTree:
+    params = _forest_params
+    features, target = _forest_arrays["features"], _forest_arrays["target"]
+    binned = None
+    if "bins" in _forest_arrays:
+        binned = (_forest_arrays["bins"], params["bin_edges"])
+
+    rng = np.random.default_rng(seed)
+    tree = DecisionTree(regression=params["regression"], ccp_alpha=0,
+                        histogram=binned is not None, max_bins=params["max_bins"],
+                        max_depth=params["max_depth"],
+                        max_features=params["max_features"], seed=rng)
+    sample_indices = rng.integers(0, len(target), len(target))
+    tree.fit(features, target, params["feature_names"], "",
+             categories=params["categories"], sample_indices=sample_indices,
+             binned=binned)
+    return tree.compiled
+
+
+class RandomForest:
+    """Bagged ensemble of decision trees.
+
+    Attributes:
+        n_trees: Number of trees
+        regression: Boolean flag for regression tasks
+        max_features: Features considered at every split (None = sqrt of
+        the feature count for classification, a third for regression)
+        max_depth: Maximum depth of every tree
+        histogram: Whether trees train on quantile-binned features
+        trees: Compiled trees; for classification leaves hold class codes
+        classes: Class labels indexed by codes
+        categories: Category labels per feature, None for numeric ones
+    """
+
+    def __init__(
+        self,
+        n_trees: int = 50,
+        regression: bool = False,
+        max_features: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        histogram: bool = True,
+        max_bins: int = 256,
+        seed: Optional[int] = None,
+        processes: Optional[int] = None
+    ):
+        """
+        Args:
+            n_trees: Number of trees
+            regression: Whether to perform regression
+            max_features: Features considered at every split
+            max_depth: Maximum depth of every tree (None = unlimited)
+            histogram: Train trees on quantile-binned features
+            max_bins: Number of bins per feature in histogram mode
+            seed: Seed for bootstrap samples and feature sampling
+            processes: Size of the process pool (None = CPU count)
+        """
+        self.n_trees = n_trees
+        self.regression = regression
+        self.max_features = max_features
+        self.max_depth = max_depth
+        self.histogram = histogram
+        self.max_bins = max_bins
+        self.seed = seed
+        self.processes = processes
+        self.trees: list = []
+        self.classes: Optional[np.ndarray] = None
+        self.feature_names: Optional[list] = None
+        self.target_name: Optional[str] = None
+        self.categories: Optional[list] = None
+
+    def build(self, csv_path, sep: str = ','):
+        """Train forest on CSV data.
+
+        Args:
+            csv_path: Path or file object of training CSV file
+            sep: CSV field separator character
+        """
+        self.fit(*read_csv_columns(csv_path, sep, self.regression))
+
+    def fit(
+        self,
+        features: np.ndarray,
+        target: np.ndarray,
+        feature_names: list,
+        target_name: str,
+        classes: Optional[np.ndarray] = None,
+        categories: Optional[list] = None
+    ):
+        """Train forest on column arrays.
+
+        Args:
+            features: Feature matrix, NaN marks missing values
+            target: Target vector, class codes for classification
+            feature_names: Feature names in column order
+            target_name: Name of target variable
+            classes: Class labels indexed by target codes
+            categories: Category labels per feature, None for numeric ones
+        """
+        self.feature_names = list(feature_names)
+        self.target_name = target_name
+        self.categories = categories
+        if not self.regression and classes is None:
+            classes, target = np.unique(target, return_inverse=True)
+        self.classes = classes
+
+        num_features = features.shape[1]
+        max_features = self.max_features
+        if max_features is None:
+            max_features = num_features // 3 if self.regression\
+                else int(np.sqrt(num_features))
+        params = {
+            "regression": self.regression,
+            "max_bins": self.max_bins,
+            "max_depth": self.max_depth,
+            "max_features": max(1, max_features),
+            "feature_names": self.feature_names,
+            "categories": categories,
+            "bin_edges": None
+        }
+        arrays = {"features": features, "target": target}
+        if self.histogram:
+            arrays["bins"], params["bin_edges"] = bin_features(
+                features, self.max_bins, categories)
+
+        seeds = np.random.SeedSequence(self.seed).generate_state(self.n_trees)
+        memory, specs = [], {}
+        try:
+            for key, array in arrays.items():
+                block, specs[key] = _share(np.ascontiguousarray(array))
+                memory.append(block)
+            with ProcessPoolExecutor(max_workers=self.processes,
+                                     initializer=_init_forest_worker,
+                                     initargs=(specs, params)) as pool:
+                self.trees = list(pool.map(_grow_forest_tree, [int(seed) for seed in seeds]))
+        finally:
+            for block in memory:
+                block.close()
+                block.unlink()
+
+    def predict_batch(self, csv_path, sep: str = ',', chunk_size: int = 65536):
+        """
+        Predict every row of CSV file, chunk_size rows at a time.
+
+        Args:
+            csv_path: Path or file object of CSV file with prediction rows
+            sep: CSV field separator character
+            chunk_size: Number of rows parsed and predicted at once
+
+        Yields:
+            Array of predictions, one per row of the chunk
+        """
+        for df in pd.read_csv(csv_path, sep=sep, chunksize=chunk_size):
+            yield self.predict(feature_matrix(df, self.feature_names, self.categories))
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Combine predictions of all trees.
+
+        Args:
+            features: Feature matrix
+
+        Returns:
+            Mean of tree predictions for regression, majority vote for
+            classification
+        """
+        votes = np.stack([tree.value[tree.apply_batch(features)]
+                          for tree in self.trees])
+        if self.regression:
+            return votes.mean(axis=0)
+
+        num_rows, num_classes = votes.shape[1], len(self.classes)
+        index = votes.astype(np.intp) + np.arange(num_rows) * num_classes
+        counts = np.bincount(index.ravel(), minlength=num_rows * num_classes)
+        return self.classes[counts.reshape(num_rows, num_classes).argmax(axis=1)]
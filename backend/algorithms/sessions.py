@@ -0,0 +1,101 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Optional
+import time
+import uuid
+
+
+class SessionStore(ABC):
+    """
+    Хранилище состояний между запросами (популяции ГА, симуляции и т.п.).
+    Бэкенд подменяется наследованием: достаточно реализовать get, put и delete.
+    """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Any]:
+        """Значение сессии или None, если её нет или она устарела."""
+
+    @abstractmethod
+    def put(self, session_id: str, value: Any):
+        """Сохраняет значение под session_id, заменяя прежнее."""
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Удаляет сессию; отсутствующая сессия - не ошибка."""
+
+    def create(self, value: Any) -> str:
+        session_id = uuid.uuid4().hex
+        self.put(session_id, value)
+        return session_id
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Хранилище в памяти процесса. Сессия живёт ttl секунд с последнего обращения,
+    при переполнении вытесняется та, к которой дольше всего не обращались (LRU).
+    Значения, для которых pinned(value) истинно, не вытесняются: по истечении ttl
+    их время обращения продлевается, а при переполнении вытесняются другие.
+    """
+
+    def __init__(self, ttl: float = 600, max_size: int = 64,
+                 pinned: Optional[Callable[[Any], bool]] = None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.pinned = pinned
+        # session_id -> (время последнего обращения, значение), порядок - от старых к новым
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = Lock()
+
+    def _evict_expired(self, now: float):
+        while self._sessions:
+            session_id, (touched, value) = next(iter(self._sessions.items()))
+            if now - touched < self.ttl:
+                break
+            del self._sessions[session_id]
+            if self.pinned is not None and self.pinned(value):
+                self._sessions[session_id] = (now, value)
+
+    def _evict_oldest(self):
+        if self.pinned is None:
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+            return
+        excess = len(self._sessions) - self.max_size
+        if excess > 0:
+            evicted = [session_id for session_id, (_, value) in self._sessions.items()
+                       if not self.pinned(value)][:excess]
+            for session_id in evicted:
+                del self._sessions[session_id]
+
+    def get(self, session_id: str) -> Optional[Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._evict_expired(now)
+
+            if session_id not in self._sessions:
+                return None
+            value = self._sessions.pop(session_id)[1]
+            self._sessions[session_id] = (now, value)
+            return value
+
+    def put(self, session_id: str, value: Any):
+        with self._lock:
+            now = time.monotonic()
+            self._evict_expired(now)
+
+            self._sessions.pop(session_id, None)
+            self._sessions[session_id] = (now, value)
+            self._evict_oldest()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def count(self, predicate: Callable[[Any], bool]) -> int:
+        with self._lock:
+            return sum(1 for _, value in self._sessions.values() if predicate(value))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
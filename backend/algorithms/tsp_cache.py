@@ -0,0 +1,72 @@
+"""
+Кэш лучших известных маршрутов TSP по набору точек.
+
+Точки округляются и сортируются, хэш отсортированного набора - ключ,
+поэтому порядок точек в запросе не важен. Маршрут хранится в индексах
+канонического порядка и переводится в индексы конкретного запроса.
+"""
+
+from typing import List, Tuple, Optional
+import hashlib
+import numpy as np
+
+from backend.algorithms.genetic_algorithm import check_routes
+from backend.algorithms.sessions import MemorySessionStore
+
+
+class TourCache:
+    decimals = 6
+
+    def __init__(self, max_size: int = 1024, ttl: float = 24 * 3600):
+        self._store = MemorySessionStore(ttl=ttl, max_size=max_size)
+
+    def canonicalize(self, points: List[Tuple[float, float]]) -> Tuple[str, np.ndarray]:
+        # order[c] - индекс точки запроса, стоящей на месте c в каноническом порядке
+        coords = np.round(np.asarray(points, dtype=np.float64).reshape(-1, 2), self.decimals) + 0.0
+        order = np.lexsort((coords[:, 1], coords[:, 0]))
+        key = hashlib.sha256(coords[order].tobytes()).hexdigest()
+        return key, order
+
+    def get(self, points: List[Tuple[float, float]]) -> Optional[dict]:
+        """Лучший известный маршрут в индексах points: {"route", "length", "optimal"}."""
+        key, order = self.canonicalize(points)
+        entry = self._store.get(key)
+        if entry is None:
+            return None
+
+        return {"route": order[entry["route"]].tolist(), "length": entry["length"], "optimal": entry["optimal"]}
+
+    def put(self, points: List[Tuple[float, float]], route: List[int], length: float, optimal: bool = False):
+        """
+        Raises:
+            ValueError: если route - не перестановка индексов points
+        """
+        # маршрут отдаётся всем следующим клиентам, поэтому повторы городов не принимаем
+        route = check_routes([route], len(points))[0]
+
+        # сохраняем, только если маршрут лучше известного или впервые доказана оптимальность
+        key, order = self.canonicalize(points)
+        entry = self._store.get(key)
+        if entry is not None and (entry["optimal"] or (entry["length"] <= length and not optimal)):
+            return
+
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        self._store.put(key, {
+            "route": inverse[route],
+            "length": float(length),
+            "optimal": optimal
+        })
+
+    def put_route_points(self, points: List[Tuple[float, float]], route_points: List[Tuple[float, float]],
+                         length: float, optimal: bool = False):
+        # решатели возвращают маршрут точками, восстанавливаем индексы
+        indices = {}
+        for i, point in enumerate(points):
+            indices.setdefault(tuple(point), []).append(i)
+        route = []
+        for point in route_points:
+            if not indices.get(tuple(point)):
+                raise ValueError("Маршрут содержит город не из набора точек или повторяет его")
+            route.append(indices[tuple(point)].pop())
+        self.put(points, route, length, optimal)
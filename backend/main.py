@@ -1,16 +1,31 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Body, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Body, Form, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 from backend.algorithms.ai.neural_network import NeuralNetwork
 from backend.algorithms.astar import AStar
 from backend.algorithms.decision_tree import DecisionTree
+from backend.algorithms.random_forest import RandomForest
+from backend.algorithms.model_registry import ModelRegistry
 # from algorithms.kmeans import kmeans_clustering
 from backend.algorithms.kmeans import KMeansData, kmeans_algorithm
-from backend.algorithms.genetic_algorithm import get_exact_solution, GeneticAlgorithm, GeneticsDto
-from backend.algorithms.ant_colony import AntColony, AntColonyDto
+from backend.algorithms.genetic_algorithm import GeneticAlgorithm, GeneticsDto, GeneticRunDto, \
+    GeneticSessionDto, GeneticIslandsDto, GeneticSession, MemeticAlgorithm, run_islands
+from backend.algorithms.exact_jobs import ExactJobManager, ExactJobDto
+from backend.algorithms.ant_colony import AntColony, AntColonyDto, AntSessionDto, AntSimulation, \
+    AntFastForwardDto, FRAME_PHEROMONE_MODES, MAX_ANT_UPDATES, check_ant_budget
+from backend.algorithms.ant_sweep import AntSweepDto, run_sweep
+from backend.algorithms.sessions import MemorySessionStore
+from backend.algorithms.tsp_cache import TourCache
 import pandas as pd
 import numpy as np
+import json
+import asyncio
+import hashlib
+import itertools
+import os
 import uvicorn
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any, Tuple
@@ -53,6 +68,68 @@ class DecisionTreePredictionData(BaseModel):
 astar = AStar()
 neural_network = NeuralNetwork()
 decision_tree = DecisionTree()
+genetic_sessions = MemorySessionStore(ttl=600, max_size=64)
+tour_cache = TourCache(max_size=1024, ttl=24 * 3600)
+ant_sessions = MemorySessionStore(ttl=600, max_size=32)
+decision_trees = MemorySessionStore(ttl=3600, max_size=32)
+model_registry = ModelRegistry(os.path.join(os.path.dirname(__file__), "models"))
+forests = MemorySessionStore(ttl=3600, max_size=8)
+MAX_FOREST_TREES = 500
+MAX_SESSION_GENERATIONS = 1000
+
+
+def remember_exact_result(job):
+    route, length, info = job.result
+    tour_cache.put_route_points(job.points, route, length, info["optimal"])
+
+
+exact_jobs = ExactJobManager(max_workers=2, on_done=remember_exact_result)
+
+
+def seed_from_cache(genetic: GeneticAlgorithm):
+    cached = tour_cache.get(genetic.points)
+    if cached is not None:
+        genetic.seed([cached["route"]])
+    return genetic
+
+
+def remember_best_route(genetic: GeneticAlgorithm):
+    route, length = genetic.best_route()
+    tour_cache.put(genetic.points, route, length)
+
+
+def get_posted_tree(tree_data: str) -> DecisionTree:
+    # присланное дерево компилируется один раз и берётся из кэша по хэшу JSON
+    key = hashlib.sha256(tree_data.encode()).hexdigest()
+    tree = decision_trees.get(key)
+    if tree is None:
+        tree_data_dict = json.loads(tree_data)
+        # присланное дерево уже обрезано, по умолчанию применяется как есть
+        tree = DecisionTree(ccp_alpha=tree_data_dict.get("ccp_alpha", 0))
+        tree.feature_names = tree_data_dict.get("feature_names", [])
+        tree.target_name = tree_data_dict.get("target_name", "")
+        tree.categories = tree_data_dict.get("categories")
+        # деревья без отметки сравниваются с признаками в float64
+        tree.float32_features = bool(tree_data_dict.get("float32_features", False))
+        tree.tree = tree_data_dict.get("tree", {})
+        tree.compiled  # компилируем до помещения в кэш
+        decision_trees.put(key, tree)
+    return tree
+
+
+def get_tree(tree_data: Optional[str], model_id: Optional[str]) -> DecisionTree:
+    # дерево из реестра по model_id или присланное целиком в tree_data
+    if model_id is not None:
+        tree = model_registry.load(model_id)
+        if tree is None:
+            raise HTTPException(status_code=404, detail="Модель не найдена")
+        return tree
+    if tree_data is None:
+        raise HTTPException(status_code=400, detail="Нужен tree_data или model_id")
+    try:
+        return get_posted_tree(tree_data)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/")
@@ -125,91 +202,388 @@ async def get_ant_algorithm():
 @app.post("/decision/build")
 async def build_decision_tree(file: UploadFile = File(...),
                               regression: bool = Form(False),
-                              ccp_alpha: float = Form(0.01)):
+                              ccp_alpha: float = Form(0.01),
+                              histogram: bool = Form(False),
+                              max_bins: int = Form(256)):
     """
     Parameters:
     - file: CSV файл
     - regression: Флаг режима регрессии (False для классификации)
-    - ccp_alpha
+    - ccp_alpha: Параметр обрезки; в реестре хранится полное дерево, обрезка
+      применяется при прогнозе, поэтому /decision/prune принимает любое alpha
+    - histogram: Обучение на квантильных бинах признаков
+    - max_bins: Число бинов на признак (3-256), один из них для пропусков
+
+    Текстовые столбцы считаются категориальными, пустые ячейки - пропусками.
     """
     try:
-        # Создаем временный файл
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp:
-            tmp_path = tmp.name
+        # CSV разбирается по частям прямо из загруженного файла
+        tree = DecisionTree(regression=regression, ccp_alpha=ccp_alpha,
+                            histogram=histogram, max_bins=max_bins)
+        await run_in_threadpool(tree.build_tree, file.file)
+        model_id = await run_in_threadpool(model_registry.save, tree)
 
-            content = await file.read()
-            tmp.write(content)
+        return {
+            "model_id": model_id,
+            "tree": tree.export_tree(),
+            "ccp_alpha": tree.ccp_alpha,
+            "feature_names": tree.feature_names,
+            "target_name": tree.target_name,
+            "categories": tree.categories,
+            "float32_features": tree.float32_features,
+            "pruning_path": tree.pruning_path()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        try:
-            tree = DecisionTree(regression=regression, ccp_alpha=ccp_alpha)
-            tree.build_tree(tmp_path)
 
-            tree_dict = {
-                "tree": tree.tree,
-                "feature_names": tree.feature_names,
-                "target_name": tree.target_name
-            }
-            result = convert_numpy_types(tree_dict)
+@app.post("/decision/pruning_path")
+async def decision_tree_pruning_path(tree_data: Optional[str] = Form(None),
+                                     model_id: Optional[str] = Form(None)):
+    """
+    Parameters:
+    - tree_data: JSON-строка со структурой дерева решений
+    - model_id: Идентификатор сохранённой модели вместо tree_data
 
-            return result
-        finally:
-            # Удаляем временный файл
-            os.unlink(tmp_path)
+    Последовательность alpha, при которых сворачиваются узлы, с ошибкой
+    и числом листьев дерева на каждом шаге.
+    """
+    tree = get_tree(tree_data, model_id)
+    try:
+        return tree.pruning_path()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/decision/prune")
+async def prune_decision_tree(tree_data: Optional[str] = Form(None),
+                              model_id: Optional[str] = Form(None),
+                              ccp_alpha: float = Form(...)):
+    """
+    Parameters:
+    - tree_data: JSON-строка со структурой дерева решений
+    - model_id: Идентификатор сохранённой модели вместо tree_data
+    - ccp_alpha: Параметр сложности, обычно одно из значений pruning_path
+
+    Обрезка без переобучения: присланное дерево не меняется.
+    """
+    tree = get_tree(tree_data, model_id)
+    try:
+        return {
+            "tree": tree.pruned(ccp_alpha),
+            "feature_names": tree.feature_names,
+            "target_name": tree.target_name,
+            "categories": tree.categories,
+            "float32_features": tree.float32_features
+        }
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/decision/predict")
 async def predict_decision_tree(file: UploadFile = File(...),
-                                tree_data: str = Form(...)):
+                                tree_data: Optional[str] = Form(None),
+                                model_id: Optional[str] = Form(None)):
     """
     Parameters:
     - file: CSV файл
     - tree_data: JSON-строка со структурой дерева решений
+    - model_id: Идентификатор сохранённой модели вместо tree_data
     """
+    tree = get_tree(tree_data, model_id)
     try:
-        tree_data_dict = json.loads(tree_data)
+        result = await run_in_threadpool(tree.predict, file.file)
+
+        return {
+            "prediction": result["value"],
+            "path": result["path"]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/decision/models/{model_id}")
+async def get_decision_tree_model(model_id: str):
+    # экспорт в JSON для визуализации
+    tree = get_tree(None, model_id)
+    return {
+        "model_id": model_id,
+        "tree": await run_in_threadpool(tree.export_tree),
+        "ccp_alpha": tree.ccp_alpha,
+        "feature_names": tree.feature_names,
+        "target_name": tree.target_name,
+        "categories": tree.categories,
+        "float32_features": tree.float32_features
+    }
+
+
+@app.delete("/decision/models/{model_id}")
+async def delete_decision_tree_model(model_id: str):
+    if not model_registry.delete(model_id):
+        raise HTTPException(status_code=404, detail="Модель не найдена")
+    return {"deleted": model_id}
+
+
+async def prediction_chunks(chunks):
+    # первая часть считается до ответа: ошибки разбора CSV и признаков становятся 400,
+    # остальные читаются и предсказываются уже при отдаче ответа
+    try:
+        first = await run_in_threadpool(next, chunks, None)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return chunks if first is None else itertools.chain([first], chunks)
+
+
+def format_predictions(chunks, names: List[str], output: str):
+    # ответ отдаётся по частям входного файла, целиком в памяти не собирается
+    if output == "csv":
+        yield ",".join(names) + "\n"
+    for columns in chunks:
+        chunk = pd.DataFrame(columns, columns=names)
+        if output == "csv":
+            yield chunk.to_csv(index=False, header=False)
+        else:
+            yield "".join(json.dumps(row) + "\n" for row in chunk.to_dict(orient="records"))
+
+
+@app.post("/decision/predict/batch")
+async def predict_decision_tree_batch(file: UploadFile = File(...),
+                                      tree_data: Optional[str] = Form(None),
+                                      model_id: Optional[str] = Form(None),
+                                      output: str = Form("csv"),
+                                      paths: bool = Form(False)):
+    """
+    Parameters:
+    - file: CSV файл, по строке на объект
+    - tree_data: JSON-строка со структурой дерева решений
+    - model_id: Идентификатор сохранённой модели вместо tree_data
+    - output: csv или ndjson
+    - paths: Добавлять путь до листа
+    """
+    if output not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="output должен быть csv или ndjson")
+    tree = get_tree(tree_data, model_id)
+    compiled = tree.compiled
+
+    def columns(leaves):
+        chunk = {"prediction": compiled.value[leaves]}
+        if paths:
+            chunk["path"] = compiled.paths[leaves]
+        return chunk
+
+    chunks = await prediction_chunks(map(columns, tree.predict_batch(file.file)))
+    names = ["prediction", "path"] if paths else ["prediction"]
+    media_type = "text/csv" if output == "csv" else "application/x-ndjson"
+    return StreamingResponse(format_predictions(chunks, names, output), media_type=media_type)
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp:
-            tmp_path = tmp.name
-
-            content = await file.read()
-            tmp.write(content)
-
-        try:
-            tree = DecisionTree()
-            tree.feature_names = tree_data_dict.get("feature_names", [])
-            tree.target_name = tree_data_dict.get("target_name", "")
-            tree.tree = tree_data_dict.get("tree", {})
-
-            result = tree.predict(tmp_path)
-
-            if isinstance(result, dict):
-                prediction = result.get("value")
-                path = result.get("path", "")
-            else:
-                prediction = result
-                path = ""
-
-            return convert_numpy_types({
-                "prediction": prediction,
-                "path": path
-            })
-        finally:
-            os.unlink(tmp_path)
+
+@app.post("/forest/build")
+async def build_random_forest(file: UploadFile = File(...),
+                              regression: bool = Form(False),
+                              n_trees: int = Form(50),
+                              max_features: Optional[int] = Form(None),
+                              max_depth: Optional[int] = Form(None),
+                              histogram: bool = Form(True),
+                              seed: Optional[int] = Form(None)):
+    """
+    Parameters:
+    - file: CSV файл
+    - regression: Флаг режима регрессии (False для классификации)
+    - n_trees: Число деревьев (1-500)
+    - max_features: Число признаков, рассматриваемых при каждом разбиении
+    - max_depth: Максимальная глубина деревьев
+    - histogram: Обучение на квантильных бинах признаков
+    - seed
+    """
+    if not 1 <= n_trees <= MAX_FOREST_TREES:
+        raise HTTPException(status_code=400, detail=f"Число деревьев должно быть от 1 до {MAX_FOREST_TREES}")
+    try:
+        forest = RandomForest(n_trees=n_trees, regression=regression, max_features=max_features,
+                              max_depth=max_depth, histogram=histogram, seed=seed)
+        await run_in_threadpool(forest.build, file.file)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    return {
+        "forest_id": forests.create(forest),
+        "n_trees": len(forest.trees),
+        "node_counts": [len(tree.feature) for tree in forest.trees],
+        "feature_names": forest.feature_names,
+        "target_name": forest.target_name
+    }
+
+
+@app.post("/forest/predict")
+async def predict_random_forest(file: UploadFile = File(...),
+                                forest_id: str = Form(...),
+                                output: str = Form("csv")):
+    """
+    Parameters:
+    - file: CSV файл, по строке на объект
+    - forest_id: Идентификатор леса из /forest/build
+    - output: csv или ndjson
+    """
+    if output not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="output должен быть csv или ndjson")
+    forest = forests.get(forest_id)
+    if forest is None:
+        raise HTTPException(status_code=404, detail="Лес не найден")
+    chunks = await prediction_chunks({"prediction": predictions} for predictions in forest.predict_batch(file.file))
+    media_type = "text/csv" if output == "csv" else "application/x-ndjson"
+    return StreamingResponse(format_predictions(chunks, ["prediction"], output), media_type=media_type)
+
 
 @app.post("/tsp/genetic")
 async def tsp_genetic(data: GeneticsDto):
-    genetic = GeneticAlgorithm(data.points, data.prev_generation)
-    return genetic.run()
+    try:
+        genetic = GeneticAlgorithm(data.points, data.prev_generation)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(data.prev_generation) == 0:
+        seed_from_cache(genetic)
+
+    result = genetic.run()
+    remember_best_route(genetic)
+    return result
+
+
+@app.post("/tsp/genetic/run")
+async def tsp_genetic_run(data: GeneticRunDto):
+    """
+    Эволюция целиком на сервере, клиенту уходят только снимки лучшего маршрута.
+    При stream=True снимки отдаются по мере готовности в формате NDJSON.
+    """
+    algorithm = MemeticAlgorithm if data.memetic else GeneticAlgorithm
+
+    def snapshots():
+        # генератор выполняется в пуле потоков, поэтому и популяция строится там же
+        genetic = seed_from_cache(algorithm(data.points, []))
+        yield from genetic.evolve(data.generations, data.patience, data.time_limit, data.snapshot_every)
+        remember_best_route(genetic)
+
+    if data.stream:
+        return StreamingResponse((json.dumps(snapshot) + "\n" for snapshot in snapshots()),
+                                 media_type="application/x-ndjson")
+    return await run_in_threadpool(list, snapshots())
+
+
+@app.post("/tsp/genetic/islands")
+async def tsp_genetic_islands(data: GeneticIslandsDto):
+    cached = tour_cache.get(data.points)
+    result = await run_in_threadpool(run_islands, data.points, data.islands, data.generations,
+                                     data.migration_interval, data.migration_size, data.topology, data.seed,
+                                     None, data.memetic, [cached["route"]] if cached else None, data.time_limit)
+    tour_cache.put(data.points, result["route_indices"], result["length"])
+    return result
+
+
+@app.post("/tsp/genetic/session")
+async def tsp_genetic_session(data: GeneticSessionDto):
+    """
+    Создаёт сессию ГА: популяция, матрица расстояний и ГСЧ остаются на сервере.
+    """
+    algorithm = MemeticAlgorithm if data.memetic else GeneticAlgorithm
+
+    def create():
+        # меметический алгоритм улучшает всю начальную популяцию локальным поиском
+        return seed_from_cache(algorithm(data.points, [], np.random.default_rng(data.seed)))
+
+    genetic = await run_in_threadpool(create)
+    route, length = genetic.best()
+    return {"session_id": genetic_sessions.create(GeneticSession(genetic)), "route": route, "length": length}
+
+
+@app.post("/tsp/genetic/session/{session_id}/step")
+async def tsp_genetic_session_step(session_id: str, generations: int = 1):
+    """
+    - generations: число поколений за запрос (не больше MAX_SESSION_GENERATIONS)
+    """
+    session = genetic_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Сессия не найдена или устарела")
+
+    generations = max(1, min(MAX_SESSION_GENERATIONS, generations))
+    route_indices, (route, length) = await run_in_threadpool(session.advance, generations)
+    tour_cache.put(session.genetic.points, route_indices, length)
+    return {"route": route, "length": length}
+
+
+@app.delete("/tsp/genetic/session/{session_id}")
+async def tsp_genetic_session_delete(session_id: str):
+    genetic_sessions.delete(session_id)
+    return {"session_id": session_id}
 
 
 @app.post("/tsp/exact")
-async def tsp_exact(points: List[Tuple[float, float]]):
-    return get_exact_solution(points)
+async def tsp_exact(points: List[Tuple[float, float]], method: str = "auto", time_limit: float = 10):
+    """
+    - method: "held_karp", "branch_and_bound" или "auto" (Хелд-Карп до 20 точек)
+    - time_limit: лимит времени метода ветвей и границ, секунды
+    """
+    if method not in ["auto", "held_karp", "branch_and_bound"]:
+        raise HTTPException(status_code=400, detail="Неизвестный метод")
+
+    cached = tour_cache.get(points)
+    if cached is not None and cached["optimal"]:
+        return ([points[i] for i in cached["route"]], cached["length"],
+                {"lower_bound": cached["length"], "gap": 0.0, "optimal": True, "nodes": 0, "cached": True})
+
+    try:
+        job = exact_jobs.submit(points, method, max(0.1, min(60, time_limit)),
+                                cached["route"] if cached else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # ждём в цикле событий, а не в пуле потоков: долгие задачи не занимают его потоки
+    while not job.finished.is_set():
+        await asyncio.sleep(0.05)
+    if job.status != "done":
+        raise HTTPException(status_code=500, detail=job.error or job.status)
+    return job.result
+
+
+@app.post("/tsp/exact/jobs")
+async def tsp_exact_job_submit(data: ExactJobDto):
+    cached = tour_cache.get(data.points)
+    try:
+        job = exact_jobs.submit(data.points, data.method, data.time_limit, cached["route"] if cached else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.to_json()
+
+
+@app.get("/tsp/exact/jobs/{job_id}")
+async def tsp_exact_job_status(job_id: str):
+    job = exact_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job.to_json()
+
+
+@app.get("/tsp/exact/jobs/{job_id}/stream")
+async def tsp_exact_job_stream(job_id: str, interval: float = 0.5):
+    """
+    Прогресс задачи в формате NDJSON, последняя строка содержит результат.
+    """
+    job = exact_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+
+    async def updates():
+        while not job.finished.is_set():
+            yield json.dumps(job.to_json()) + "\n"
+            await asyncio.sleep(max(0.05, interval))
+        yield json.dumps(job.to_json()) + "\n"
+
+    return StreamingResponse(updates(), media_type="application/x-ndjson")
+
+
+@app.delete("/tsp/exact/jobs/{job_id}")
+async def tsp_exact_job_cancel(job_id: str):
+    job = exact_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job.to_json()
 
 
 @app.get("/ant")
@@ -250,3 +624,143 @@ async def ants_simulate(data: SimulateParams):
     colony.update(data.delta_time)
     return colony.to_json()
 
+
+def get_ant_simulation(session_id: str) -> AntSimulation:
+    simulation = ant_sessions.get(session_id)
+    if simulation is None:
+        raise HTTPException(status_code=404, detail="Сессия не найдена или устарела")
+    return simulation
+
+
+@app.post("/ants/session")
+async def ants_session(data: AntSessionDto):
+    colony = AntColony(data.home, data.colony_size, data.seed)
+    colony.food_sources = [tuple(source) for source in data.food_sources]
+    simulation = AntSimulation(colony)
+    return {"session_id": ant_sessions.create(simulation), **simulation.frame()}
+
+
+def is_frame_format(frame_format: str, pheromones: str) -> bool:
+    return frame_format in ["json", "binary"] and pheromones in FRAME_PHEROMONE_MODES
+
+
+def frame_steps(simulation: AntSimulation, steps: int) -> int:
+    # шагов за кадр не больше 10000 и не больше MAX_ANT_UPDATES шагов муравьёв, как в /step
+    return max(1, min(10000, steps, MAX_ANT_UPDATES // max(1, simulation.colony.colony_size)))
+
+
+@app.post("/ants/session/{session_id}/step")
+async def ants_session_step(session_id: str, steps: int = 1, delta_time: float = 1,
+                            format: str = "json", pheromones: str = "grid", sample_every: int = 0):
+    """
+    - format: "json" или "binary" (см. FRAME_HEADER в ant_colony.py)
+    - pheromones: для бинарного кадра "grid" или "sparse"
+    - sample_every: для JSON вернуть {"frames": [...]} с кадром каждые sample_every шагов
+    """
+    if not is_frame_format(format, pheromones):
+        raise HTTPException(status_code=400, detail="Неизвестный формат кадра")
+    simulation = get_ant_simulation(session_id)
+    steps = max(1, min(10000, steps))
+    try:
+        check_ant_budget(simulation.colony.colony_size, steps, max(0, sample_every))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if format == "binary":
+        frame = await run_in_threadpool(simulation.advance_encoded, steps, delta_time, pheromones)
+        return Response(content=frame, media_type="application/octet-stream")
+    frames = await run_in_threadpool(simulation.advance, steps, delta_time, max(0, sample_every))
+    return {"frames": frames} if sample_every > 0 else frames[-1]
+
+
+@app.post("/ants/fast_forward")
+async def ants_fast_forward(data: AntFastForwardDto):
+    """
+    Прогон новой колонии на steps шагов без сессии. С одинаковым seed
+    результат повторяется, sample_every задаёт частоту промежуточных кадров.
+    """
+    colony = AntColony(data.home, data.colony_size, data.seed)
+    colony.food_sources = [tuple(source) for source in data.food_sources]
+    frames = await run_in_threadpool(colony.advance, data.steps, data.delta_time, data.sample_every)
+    return {"frames": frames}
+
+
+@app.post("/ants/sweep")
+async def ants_sweep(data: AntSweepDto):
+    try:
+        table = await run_in_threadpool(run_sweep, data.home, data.colony_size, data.food_sources, data.parameters,
+                                        data.ticks, data.repeats, data.delta_time, data.seed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"table": table}
+
+
+@app.put("/ants/session/{session_id}/food_sources")
+async def ants_session_food_sources(session_id: str, food_sources: List[Tuple[float, float, float]]):
+    get_ant_simulation(session_id).set_food_sources(food_sources)
+    return {"session_id": session_id}
+
+
+@app.delete("/ants/session/{session_id}")
+async def ants_session_delete(session_id: str):
+    ant_sessions.delete(session_id)
+    return {"session_id": session_id}
+
+
+@app.websocket("/ants/session/{session_id}/ws")
+async def ants_session_ws(websocket: WebSocket, session_id: str, interval: float = 0.05,
+                          steps: int = 1, delta_time: float = 1, format: str = "json", pheromones: str = "grid"):
+    """
+    Симуляция идёт по часам сервера: каждые interval секунд колония делает steps
+    шагов и клиенту уходит кадр (JSON или бинарный, как в /step). Клиент может
+    прислать JSON с полями food_sources, interval, steps, paused; steps урезается
+    до бюджета check_ant_budget, неверное сообщение закрывает соединение с кодом 4400.
+    """
+    await websocket.accept()
+    if not is_frame_format(format, pheromones):
+        await websocket.close(code=4400)
+        return
+    settings = {"interval": max(0.01, interval), "steps": max(1, min(10000, steps)), "paused": False}
+
+    async def receive_settings():
+        while True:
+            message = await websocket.receive_json()
+            try:
+                simulation = ant_sessions.get(session_id)
+                if "food_sources" in message and simulation is not None:
+                    simulation.set_food_sources(message["food_sources"])
+                if "interval" in message:
+                    settings["interval"] = max(0.01, float(message["interval"]))
+                if "steps" in message:
+                    settings["steps"] = max(1, min(10000, int(message["steps"])))
+                if "paused" in message:
+                    settings["paused"] = bool(message["paused"])
+            except (ValueError, TypeError, KeyError, IndexError):
+                await websocket.close(code=4400)
+                return
+
+    receiver = asyncio.create_task(receive_settings())
+    try:
+        while not receiver.done():
+            simulation = ant_sessions.get(session_id)
+            if simulation is None:
+                await websocket.close(code=4404)
+                break
+
+            steps = frame_steps(simulation, settings["steps"])
+            if not settings["paused"] and format == "binary":
+                frame = await run_in_threadpool(simulation.advance_encoded, steps, delta_time, pheromones)
+                if receiver.done():
+                    # соединение закрыто, пока считался кадр
+                    break
+                await websocket.send_bytes(frame)
+            elif not settings["paused"]:
+                frames = await run_in_threadpool(simulation.advance, steps, delta_time)
+                if receiver.done():
+                    break
+                await websocket.send_json(frames[-1])
+            await asyncio.sleep(settings["interval"])
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
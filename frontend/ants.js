@@ -27,6 +27,8 @@ class AntsColony {
         this.pheromones_size = this.ant_size * 3 / 5;
 
         this.running = false;
+        this.session_id = null;
+        this.socket = null;
     }
     
     initialize() {
@@ -134,14 +136,15 @@ class AntsColony {
                 break;
             case 'stop':
                 this.running = false;
+                await this.stop_session();
                 this.ants = [];
                 this.pheromones = [];
                 this.draw();
                 break;
             case 'start':
+                await this.stop_session();
                 this.running = true;
-                await this.generate_colony();
-                this.algortithm_step();
+                await this.start_session();
                 break;
         }
     }
@@ -183,6 +186,7 @@ class AntsColony {
             }
         }
 
+        this.send_food_sources();
         this.draw();
     }
 
@@ -191,58 +195,113 @@ class AntsColony {
         console.log(currentFood);
         if (this.currentTool == 'edit' && this.current_food_idx != -1 && !isNaN(currentFood)) {
             this.food_sources[this.current_food_idx][2] = currentFood;
+            this.send_food_sources();
         }
     }
     
 
-    async algortithm_step() {
-        if (!this.running) return;
-
+    async start_session() {
         try {
-            const response = await fetch('http://localhost:8000/ants/simulate', {
+            const response = await fetch('http://localhost:8000/ants/session', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
                 },
                 body: JSON.stringify({
-                    colony_dto: {
-                        home: this.home,
-                        ants: this.ants,
-                        food_sources: this.food_sources,
-                        pheromones: this.pheromones
-                    },
-                    delta_time: 1
+                    home: this.home,
+                    colony_size: +document.getElementById('ants-cnt').value,
+                    food_sources: this.food_sources
                 })
             });
-            
-            const data = await response.json();
-            this.ants = data.ants;
-            this.pheromones = data.pheromones;
-            console.log(this.pheromones.length);
-            this.draw();
 
-            await new Promise(resolve => setTimeout(resolve, 50));
+            const data = await response.json();
+            this.session_id = data.session_id;
+            this.apply_frame(data);
 
-            this.algortithm_step();
+            // колония живёт на сервере, кадры приходят по WebSocket
+            this.socket = new WebSocket(`ws://localhost:8000/ants/session/${this.session_id}/ws?interval=0.05&format=binary`);
+            this.socket.binaryType = 'arraybuffer';
+            this.socket.onmessage = (event) => this.apply_frame(this.decode_frame(event.data));
         } catch (error) {
             console.error(error);
         }
     }
 
-    async generate_colony() {
-        const response = await fetch('http://localhost:8000/ants/generate', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                home: this.home,
-                colony_size: +document.getElementById('ants-cnt').value
-            })
-        });
+    async stop_session() {
+        if (this.socket) {
+            this.socket.close();
+            this.socket = null;
+        }
+        if (this.session_id) {
+            await fetch(`http://localhost:8000/ants/session/${this.session_id}`, { method: 'DELETE' });
+            this.session_id = null;
+        }
+    }
+
+    send_food_sources() {
+        if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+            this.socket.send(JSON.stringify({ food_sources: this.food_sources }));
+        }
+    }
 
-        const data = await response.json();
-        this.ants = data.ants;
+    // разбор бинарного кадра (формат описан у FRAME_HEADER в backend/algorithms/ant_colony.py)
+    decode_frame(buffer) {
+        const view = new DataView(buffer);
+        const mode = view.getUint8(5);
+        const tick = view.getUint32(8, true);
+        const antsCnt = view.getUint32(12, true);
+        const cells = view.getUint16(16, true);
+        const cellSize = view.getFloat32(20, true);
+        const scale = view.getFloat32(24, true);
+
+        let offset = 28;
+        const coords = new Float32Array(buffer, offset, antsCnt * 2);
+        offset += antsCnt * 8;
+        const flags = new Uint8Array(buffer, offset, antsCnt);
+        offset += antsCnt;
+
+        let indices, values;
+        if (mode === 0) {
+            values = new Uint8Array(buffer, offset, 2 * cells * cells);
+        } else {
+            offset += (4 - offset % 4) % 4;
+            const count = view.getUint32(offset, true);
+            indices = new Uint32Array(buffer, offset + 4, count);
+            values = new Uint8Array(buffer, offset + 4 + count * 4, count);
+        }
+
+        const pheromones = [];
+        for (let i = 0; i < values.length; ++i) {
+            if (values[i] === 0) continue;
+            const cell = indices ? indices[i] : i;
+            const kind = Math.floor(cell / (cells * cells));
+            const x = Math.floor(cell / cells) % cells;
+            const y = cell % cells;
+            pheromones.push([(x + 0.5) * cellSize, (y + 0.5) * cellSize, values[i] / 255 * scale, kind]);
+        }
+
+        const positions = [];
+        for (let i = 0; i < antsCnt; ++i) {
+            positions.push([coords[2 * i], coords[2 * i + 1]]);
+        }
+
+        return {
+            tick: tick,
+            positions: positions,
+            is_holding_food: Array.from(flags, flag => (flag & 1) === 1),
+            pheromones: pheromones
+        };
+    }
+
+    apply_frame(frame) {
+        if (!this.running) return;
+
+        this.ants = frame.positions.map((position, i) => ({
+            position: position,
+            is_holding_food: frame.is_holding_food[i]
+        }));
+        this.pheromones = frame.pheromones;
+        this.draw();
     }
 
     draw() {
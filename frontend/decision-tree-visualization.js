@@ -227,6 +227,8 @@ class DecisionTreeVisualization {
             this.tree = result.tree;
             this.feature_names = result.feature_names;
             this.target_name = result.target_name;
+            this.categories = result.categories;
+            this.float32_features = result.float32_features;
             this.visualizeTree(this.tree);
             
             const switchButton = document.querySelector('.switch-button');
@@ -290,7 +292,9 @@ class DecisionTreeVisualization {
                     <span class="direction yes">Да</span>
                     <span class="direction no">Нет</span>
                 </div>
-                <div class="node-split">${node.feature_name} ≤ ${node.threshold.toFixed(2)}</div>
+                <div class="node-split">${node.categories
+                    ? `${node.feature_name} ∈ {${node.categories.join(', ')}}`
+                    : `${node.feature_name} ≤ ${node.threshold.toFixed(2)}`}</div>
             `;
             
             const children = document.createElement('div');
@@ -328,7 +332,9 @@ class DecisionTreeVisualization {
             const treeDataStr = JSON.stringify({
                 tree: this.tree,
                 feature_names: this.feature_names,
-                target_name: this.target_name
+                target_name: this.target_name,
+                categories: this.categories,
+                float32_features: this.float32_features
             });
             formData.append('tree_data', treeDataStr);
             
@@ -9,7 +9,6 @@ class Genetic {
         this.pointR = 10;
         this.defaultPointColor = [0, 0, 0];
         this.iterationCnt = 200;
-        this.generation = [];
     }
 
     initialize() {
@@ -169,31 +168,42 @@ class Genetic {
         try {
             let arrayPoints = [...this.points].map(point => [point[0], point[1]]);
 
-            for (let i = 0; i < this.iterationCnt; ++i) {
-                const response = await fetch('http://localhost:8000/tsp/genetic', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({
-                        points: arrayPoints,
-                        prev_generation: this.generation
-                    })
-                });
-                
-                let data = await response.json();
-                this.generation = data[2];
+            const response = await fetch('http://localhost:8000/tsp/genetic/run', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    points: arrayPoints,
+                    generations: this.iterationCnt,
+                    snapshot_every: 10,
+                    stream: true
+                })
+            });
+
+            // снимки лучшего маршрута приходят построчно (NDJSON)
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
 
-                if (i % 10 == 0) {
+                buffer += decoder.decode(value, { stream: true });
+                let lines = buffer.split('\n');
+                buffer = lines.pop();
+
+                lines.filter(line => line.length > 0).forEach(line => {
+                    let data = JSON.parse(line);
                     this.draw(true);
-                    this.draw_path(data[0], 'red');
-                    console.log(data[1]);
-                    // await new Promise(resolve => setTimeout(resolve, 200));
-                }
+                    this.draw_path(data.route, 'red');
+                    console.log(data.length);
+                });
             }
 
-            if (arrayPoints.length <= 15) {
-                const response = await fetch('http://localhost:8000/tsp/exact', {
+            if (arrayPoints.length <= 60) {
+                const response = await fetch('http://localhost:8000/tsp/exact?time_limit=5', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json'